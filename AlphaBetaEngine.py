@@ -0,0 +1,257 @@
+# Description: class AlphaBetaEngine is a computer opponent for Hasami Shogi (Variant 1). Given a HasamiShogiGame
+# (or a BitboardGame) it copies the position into a BitboardGame and runs an iterative deepening alpha-beta search
+# with a transposition table, ordering capturing moves first. The search stops at a hard wall-clock deadline and
+# returns the best move from the deepest completed iteration. Run this file to play against the engine.
+
+import argparse
+import time
+
+from BitboardGame import BitboardGame, SQUARE_NAMES
+from HasamiShogiGame import HasamiShogiGame
+from TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+PIECE_VALUE = 100
+WIN_SCORE = 100000
+WIN_THRESHOLD = WIN_SCORE - 1000    # scores beyond this are wins found at a known ply
+
+
+class _SearchTimeout(Exception):
+    """Raised inside the search when the deadline has passed"""
+
+
+class AlphaBetaEngine:
+    """Represents an alpha-beta search engine that picks moves within a time budget"""
+
+    def __init__(self, time_limit=0.05, max_depth=32, table_bits=18, book=None):
+        """Creates an engine that searches for at most time_limit seconds and max_depth plies per move.
+        book is an optional OpeningBook whose move is played without searching while the position is in it."""
+        self._time_limit = time_limit
+        self._book = book
+        self._max_depth = max_depth
+        self._table = TranspositionTable(table_bits)
+        self._deadline = 0.0
+        self._nodes = 0
+        self._stats = {}
+
+    def get_stats(self):
+        """Returns a dict describing the last search: depth, score, nodes, seconds, nodes per second and whether
+        the move came from the opening book"""
+        return dict(self._stats)
+
+    def best_move(self, game):
+        """Returns the best (from_square, to_square) move for the active player, or None if there is no move"""
+        board = BitboardGame.from_game(game)    # the search works on its own copy of the position
+        start = time.perf_counter()
+        if self._book is not None:
+            move = self._book.choose_move(board)
+            if move is not None:
+                self._stats = {'depth': 0, 'score': 0, 'nodes': 0, 'seconds': time.perf_counter() - start,
+                               'nodes_per_second': 0.0, 'book': True}
+                return move
+        self._deadline = start + self._time_limit
+        self._nodes = 0
+        self._table.new_search()
+
+        moves = self._ordered_moves(board, None)
+        best_move = moves[0] if moves else None
+        best_value = 0
+        depth_reached = 0
+        for depth in range(1, self._max_depth + 1):
+            if best_move is None:
+                break
+            try:
+                best_value, best_move = self._search_root(board, depth, best_move)
+            except _SearchTimeout:
+                break
+            depth_reached = depth
+            if abs(best_value) >= WIN_THRESHOLD:
+                break   # forced result found, deeper search cannot change it
+            if time.perf_counter() - start > self._time_limit / 2:
+                break   # the next iteration would not finish in time
+
+        seconds = time.perf_counter() - start
+        self._stats = {
+            'depth': depth_reached,
+            'score': best_value,
+            'nodes': self._nodes,
+            'seconds': seconds,
+            'nodes_per_second': self._nodes / seconds if seconds > 0 else 0.0,
+            'book': False,
+        }
+        if best_move is None:
+            return None
+        return SQUARE_NAMES[best_move[0]], SQUARE_NAMES[best_move[1]]
+
+    def _search_root(self, board, depth, first_move):
+        """Searches every root move to depth plies, starting with first_move, and returns (value, best move)"""
+        alpha = -WIN_SCORE - 1
+        beta = WIN_SCORE + 1
+        best_move = first_move
+        for move in self._ordered_moves(board, first_move):
+            board.push(move)
+            value = -self._negamax(board, depth - 1, -beta, -alpha, 1)
+            board.pop()
+            if value > alpha:
+                alpha = value
+                best_move = move
+        self._table.store(board.get_zobrist_key(), depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        """Returns the value of the position for the side to move, searched to depth plies"""
+        self._nodes += 1
+        if time.perf_counter() >= self._deadline:
+            raise _SearchTimeout
+
+        if board.get_game_state() != 'UNFINISHED':
+            return -WIN_SCORE + ply     # the previous move won the game
+        if depth == 0:
+            return self._evaluate(board)
+
+        key = board.get_zobrist_key()
+        table_move = None
+        entry = self._table.probe(key)
+        if entry is not None:
+            entry_depth, value, flag, table_move = entry
+            if entry_depth >= depth:
+                value = _value_from_table(value, ply)
+                if flag == EXACT:
+                    return value
+                if flag == LOWER_BOUND and value >= beta:
+                    return value
+                if flag == UPPER_BOUND and value <= alpha:
+                    return value
+
+        moves = self._ordered_moves(board, table_move)
+        if not moves:
+            return 0    # no move available, treated as a draw
+
+        original_alpha = alpha
+        best_value = -WIN_SCORE - 1
+        best_move = None
+        for move in moves:
+            board.push(move)
+            value = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+            if value > best_value:
+                best_value = value
+                best_move = move
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        if best_value <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_value >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self._table.store(key, depth, _value_to_table(best_value, ply), flag, best_move)
+        return best_value
+
+    def _ordered_moves(self, board, first_move):
+        """Returns the legal moves with first_move first, then captures (most pieces taken first), then the rest"""
+        captures = []
+        quiet_moves = []
+        for move in board.legal_move_indices():
+            if move == first_move:
+                continue
+            num_captured = board.get_move_captures(move).bit_count()
+            if num_captured:
+                captures.append((num_captured, move))
+            else:
+                quiet_moves.append(move)
+        captures.sort(reverse=True)
+        ordered = [move for _, move in captures]
+        ordered.extend(quiet_moves)
+        if first_move is not None and board.push(first_move):   # only keep first_move if it is legal here
+            board.pop()
+            ordered.insert(0, first_move)
+        return ordered
+
+    def _evaluate(self, board):
+        """Returns the material balance of the position for the side to move"""
+        score = (board.get_num_captured_pieces('RED') - board.get_num_captured_pieces('BLACK')) * PIECE_VALUE
+        if board.get_active_player() == 'BLACK':
+            return score
+        return -score
+
+
+def _value_to_table(value, ply):
+    """Converts a win score relative to the root into one relative to the stored position"""
+    if value >= WIN_THRESHOLD:
+        return value + ply
+    if value <= -WIN_THRESHOLD:
+        return value - ply
+    return value
+
+
+def _value_from_table(value, ply):
+    """Converts a stored win score back into one relative to the root"""
+    if value >= WIN_THRESHOLD:
+        return value - ply
+    if value <= -WIN_THRESHOLD:
+        return value + ply
+    return value
+
+
+def self_play(num_moves, time_limit):
+    """Plays the engine against itself and prints nodes and nodes per second for every move"""
+    game = HasamiShogiGame()
+    engine = AlphaBetaEngine(time_limit)
+    total_nodes = 0
+    total_seconds = 0.0
+    for number in range(num_moves):
+        move = engine.best_move(game)
+        if move is None or not game.make_move(*move):
+            break
+        stats = engine.get_stats()
+        total_nodes += stats['nodes']
+        total_seconds += stats['seconds']
+        print(f"{number + 1:3d}. {move[0]}-{move[1]}  depth {stats['depth']:2d}  score {stats['score']:7d}  "
+              f"nodes {stats['nodes']:7d}  {stats['nodes_per_second']:9.0f} nodes/sec")
+        if game.get_game_state() != 'UNFINISHED':
+            break
+    print(f"Total: {total_nodes} nodes in {total_seconds:.2f}s, {total_nodes / total_seconds:.0f} nodes/sec")
+    print(f"Game state: {game.get_game_state()}")
+
+
+def play_human(time_limit):
+    """Plays a game between a human (BLACK) typing squares and the engine (RED)"""
+    game = HasamiShogiGame()
+    engine = AlphaBetaEngine(time_limit)
+
+    while game.get_game_state() == 'UNFINISHED':
+        print(f"Current Player: {game.get_active_player()}")
+
+        if game.get_active_player() == 'RED':
+            move = engine.best_move(game)
+            if move is None:
+                print("Computer has no move.")
+                break
+            game.make_move(*move)
+            print(f"Computer moves {move[0]} to {move[1]}")
+            continue
+
+        from_square = input("Enter the source square: ")
+        to_square = input("Enter the destination square: ")
+
+        if game.make_move(from_square, to_square):
+            print("Move successful!")
+        else:
+            print("Invalid move. Try again.")
+
+    print(f"Game Over! {game.get_game_state()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Hasami Shogi against the alpha-beta engine")
+    parser.add_argument('--time', type=float, default=0.05, help="seconds per engine move")
+    parser.add_argument('--self-play', type=int, metavar='MOVES', help="benchmark the engine against itself")
+    args = parser.parse_args()
+
+    if args.self_play:
+        self_play(args.self_play, args.time)
+    else:
+        play_human(args.time)
@@ -0,0 +1,234 @@
+# Description: class BatchSimulator steps thousands of Hasami Shogi (Variant 1) games in lockstep with NumPy.
+# The boards are held as an (N, 9, 9) int8 array (0 empty, 1 BLACK, -1 RED) and every step applies one move per
+# game. Move validation (sliding limits along the row and column) and sandwich captures, including the corner rule
+# of HasamiShogiGame._corner_capture, are computed for all games at once with array operations. Run this file to
+# cross-check the simulator against HasamiShogiGame.make_move and to measure its throughput.
+
+import random
+import time
+
+import numpy as np
+
+from BitboardGame import BitboardGame, BOARD_SIZE, NUM_SQUARES, SQUARE_NAMES, SQUARE_INDEX
+from HasamiShogiGame import HasamiShogiGame
+
+EMPTY = 0
+BLACK = 1
+RED = -1
+OFF_BOARD = 2       # value of the padding cell; blocks movement and is neither friend nor enemy
+
+UNFINISHED = 0      # values of the states array; BLACK (1) and RED (-1) mean that color has won
+_STATE_NAMES = {UNFINISHED: 'UNFINISHED', BLACK: 'BLACK_WON', RED: 'RED_WON'}
+
+
+def _build_ray_table():
+    """Returns an (81, 4, 9) table of the squares walking outward from each square, padded with the off-board cell"""
+    table = np.full((NUM_SQUARES, 4, BOARD_SIZE), NUM_SQUARES, dtype=np.intp)
+    for index in range(NUM_SQUARES):
+        row, column = divmod(index, BOARD_SIZE)
+        rays = (
+            [r * BOARD_SIZE + column for r in range(row - 1, -1, -1)],
+            [r * BOARD_SIZE + column for r in range(row + 1, BOARD_SIZE)],
+            [row * BOARD_SIZE + c for c in range(column - 1, -1, -1)],
+            [row * BOARD_SIZE + c for c in range(column + 1, BOARD_SIZE)],
+        )
+        for direction, ray in enumerate(rays):
+            table[index, direction, :len(ray)] = ray
+    return table
+
+
+def _build_corner_table():
+    """Returns an (81, 2) table of the (corner, partner) squares for corner captures, or the off-board cell"""
+    table = np.full((NUM_SQUARES, 2), NUM_SQUARES, dtype=np.intp)
+    for mover, corner, partner in (
+            ('a2', 'a1', 'b1'), ('b1', 'a1', 'a2'),
+            ('a8', 'a9', 'b9'), ('b9', 'a9', 'a8'),
+            ('h1', 'i1', 'i2'), ('i2', 'i1', 'h1'),
+            ('i8', 'i9', 'h9'), ('h9', 'i9', 'i8')):
+        table[SQUARE_INDEX[mover]] = SQUARE_INDEX[corner], SQUARE_INDEX[partner]
+    return table
+
+
+RAY_TABLE = _build_ray_table()
+CORNER_TABLE = _build_corner_table()
+
+
+class BatchSimulator:
+    """Represents N games of Hasami Shogi that are stepped together"""
+
+    def __init__(self, num_games):
+        """Creates num_games games in the starting position"""
+        self._num_games = num_games
+        self._cells = np.zeros((num_games, NUM_SQUARES + 1), dtype=np.int8)   # last cell is the off-board pad
+        self._cells[:, NUM_SQUARES] = OFF_BOARD
+        self._cells[:, :BOARD_SIZE] = RED
+        self._cells[:, NUM_SQUARES - BOARD_SIZE:NUM_SQUARES] = BLACK
+        self._active = np.full(num_games, BLACK, dtype=np.int8)
+        self._states = np.full(num_games, UNFINISHED, dtype=np.int8)
+        self._black_captured = np.zeros(num_games, dtype=np.int8)
+        self._red_captured = np.zeros(num_games, dtype=np.int8)
+        self._rows = np.arange(num_games)
+
+    def get_boards(self):
+        """Returns the (N, 9, 9) board array (a view, do not modify)"""
+        return self._cells[:, :NUM_SQUARES].reshape(self._num_games, BOARD_SIZE, BOARD_SIZE)
+
+    def get_active_players(self):
+        """Returns the active player of each game (1 BLACK, -1 RED)"""
+        return self._active
+
+    def get_states(self):
+        """Returns the state of each game (0 unfinished, 1 BLACK won, -1 RED won)"""
+        return self._states
+
+    def get_game_state(self, game):
+        """Returns the state of one game as 'UNFINISHED', 'RED_WON' or 'BLACK_WON'"""
+        return _STATE_NAMES[int(self._states[game])]
+
+    def get_num_captured_pieces(self):
+        """Returns the (black, red) arrays of captured piece counts"""
+        return self._black_captured, self._red_captured
+
+    def _slide_limits(self, from_squares):
+        """Returns an (N, 4) array of how many empty squares each moving piece can slide over in each direction"""
+        rays = RAY_TABLE[from_squares]                          # (N, 4, 9)
+        blocked = self._cells[self._rows[:, None, None], rays] != EMPTY
+        return blocked.argmax(axis=2)                           # index of the first blocker along each ray
+
+    def step(self, from_squares, to_squares):
+        """Applies one move per game (square indices 0..80) and returns a boolean array of the moves made"""
+        cells = self._cells
+        rows = self._rows
+        active = self._active
+        from_squares = np.asarray(from_squares, dtype=np.intp)
+        to_squares = np.asarray(to_squares, dtype=np.intp)
+
+        # a move is valid if the game is on, the mover owns from_square and to_square lies within its slide limits
+        rays = RAY_TABLE[from_squares]
+        on_ray = rays == to_squares[:, None, None]
+        distance = on_ray.argmax(axis=2)
+        limits = self._slide_limits(from_squares)
+        reachable = (on_ray.any(axis=2) & (distance < limits)).any(axis=1)
+        valid = (self._states == UNFINISHED) & (cells[rows, from_squares] == active) & reachable
+
+        moved = rows[valid]
+        movers = active[valid]
+        to_moved = to_squares[valid]
+        cells[moved, from_squares[valid]] = EMPTY
+        cells[moved, to_moved] = movers
+
+        # sandwich captures: a run of enemy pieces outward from to_square closed by a friendly piece
+        capture_rays = RAY_TABLE[to_moved]                                      # (M, 4, 9)
+        relative = cells[moved[:, None, None], capture_rays] * movers[:, None, None]
+        is_enemy = relative == -1
+        run_length = (~is_enemy).argmax(axis=2)                                 # (M, 4)
+        closer = np.take_along_axis(relative, run_length[:, :, None], axis=2)[:, :, 0]
+        closed = (run_length > 0) & (closer == 1)
+        captured = (np.arange(BOARD_SIZE) < run_length[:, :, None]) & closed[:, :, None]
+        num_captured = captured.sum(axis=(1, 2))
+        capture_games = np.broadcast_to(moved[:, None, None], captured.shape)[captured]
+        cells[capture_games, capture_rays[captured]] = EMPTY
+
+        # corner captures
+        corners = CORNER_TABLE[to_moved]
+        corner_taken = ((cells[moved, corners[:, 0]] == -movers) & (cells[moved, corners[:, 1]] == movers))
+        cells[moved[corner_taken], corners[corner_taken, 0]] = EMPTY
+        num_captured += corner_taken
+
+        # the color opposite the mover loses the captured pieces
+        black_moved = movers == BLACK
+        self._red_captured[moved[black_moved]] += num_captured[black_moved].astype(np.int8)
+        self._black_captured[moved[~black_moved]] += num_captured[~black_moved].astype(np.int8)
+        self._states[self._black_captured >= BOARD_SIZE - 1] = RED
+        self._states[self._red_captured >= BOARD_SIZE - 1] = BLACK
+        active[moved] = -movers
+        return valid
+
+    def random_moves(self, rng):
+        """Returns (from_squares, to_squares) with a uniformly chosen legal move of a random piece for every game"""
+        num_games = self._num_games
+        own = self._cells[:, :NUM_SQUARES] == self._active[:, None]
+        from_squares = np.zeros(num_games, dtype=np.intp)
+        limits = np.zeros((num_games, 4), dtype=np.intp)
+        pending = np.ones(num_games, dtype=bool)
+        while pending.any():
+            # pick a random owned piece for games that still need one, excluding pieces found to be stuck
+            scores = np.where(own, rng.random(own.shape), -1.0)
+            picked = scores.argmax(axis=1)
+            has_piece = own[self._rows, picked]
+            pending &= has_piece
+            from_squares[pending] = picked[pending]
+            limits[pending] = self._slide_limits(from_squares)[pending]
+            stuck = pending & (limits.sum(axis=1) == 0)
+            own[self._rows[stuck], picked[stuck]] = False
+            pending = stuck
+
+        totals = limits.sum(axis=1)
+        choice = (rng.random(num_games) * np.maximum(totals, 1)).astype(np.intp)
+        bounds = limits.cumsum(axis=1)
+        direction = (choice[:, None] >= bounds).sum(axis=1).clip(max=3)
+        distance = choice - (bounds[self._rows, direction] - limits[self._rows, direction])
+        to_squares = RAY_TABLE[from_squares, direction, distance]
+        to_squares[totals == 0] = from_squares[totals == 0]    # no legal move: submit an invalid null move
+        return from_squares, to_squares
+
+
+def cross_check(num_games=64, num_steps=150, seed=0):
+    """Steps the simulator and HasamiShogiGame objects with the same mixed legal and random moves.
+    Raises AssertionError on the first difference in move results, boards, captures or states."""
+    rng = np.random.default_rng(seed)
+    simulator = BatchSimulator(num_games)
+    games = [HasamiShogiGame() for _ in range(num_games)]
+    for step in range(num_steps):
+        from_squares, to_squares = simulator.random_moves(rng)
+        noise = rng.random(num_games) < 0.3     # replace some moves with arbitrary, mostly invalid, ones
+        from_squares[noise] = rng.integers(0, NUM_SQUARES, noise.sum())
+        to_squares[noise] = rng.integers(0, NUM_SQUARES, noise.sum())
+
+        valid = simulator.step(from_squares, to_squares)
+        black_captured, red_captured = simulator.get_num_captured_pieces()
+        boards = simulator.get_boards().reshape(num_games, NUM_SQUARES)
+        for number, game in enumerate(games):
+            made = game.make_move(SQUARE_NAMES[from_squares[number]], SQUARE_NAMES[to_squares[number]])
+            assert made == bool(valid[number]), (step, number, 'move result')
+            reference = BitboardGame.from_game(game)
+            black_board, red_board = reference.get_boards()
+            for index in range(NUM_SQUARES):
+                expected = BLACK if black_board >> index & 1 else RED if red_board >> index & 1 else EMPTY
+                assert boards[number, index] == expected, (step, number, SQUARE_NAMES[index])
+            assert game.get_num_captured_pieces('BLACK') == black_captured[number], (step, number, 'captures')
+            assert game.get_num_captured_pieces('RED') == red_captured[number], (step, number, 'captures')
+            assert game.get_game_state() == simulator.get_game_state(number), (step, number, 'state')
+    print(f"cross-check passed: {num_games} games x {num_steps} steps match HasamiShogiGame.make_move")
+
+
+def benchmark(num_games=4096, num_steps=200, seed=0):
+    """Prints random-playout throughput of the simulator and of BitboardGame stepped one game at a time"""
+    rng = np.random.default_rng(seed)
+    simulator = BatchSimulator(num_games)
+    num_moves = 0
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        num_moves += int(simulator.step(*simulator.random_moves(rng)).sum())
+    batch_seconds = time.perf_counter() - start
+
+    python_rng = random.Random(seed)
+    num_single_moves = 0
+    start = time.perf_counter()
+    for _ in range(num_games // 16):
+        game = BitboardGame()
+        for _ in range(num_steps):
+            moves = game.legal_move_indices()
+            if not moves:
+                break
+            game.push(python_rng.choice(moves))
+            num_single_moves += 1
+    single_seconds = time.perf_counter() - start
+
+    print(f"BatchSimulator ({num_games} games): {num_moves / batch_seconds:12.0f} moves/sec")
+    print(f"BitboardGame (one at a time):   {num_single_moves / single_seconds:12.0f} moves/sec")
+
+
+if __name__ == "__main__":
+    cross_check()
+    benchmark()
@@ -0,0 +1,607 @@
+# Description: class BitboardGame is an alternative board core for Hasami Shogi (Variant 1). The 81 squares are
+# stored as two integers, one bitboard per color, where bit (row * 9 + column) is set when a piece of that color
+# occupies the square. Row 0 is 'a' and column 0 is '1', so 'a1' is bit 0 and 'i9' is bit 80. BitboardGame exposes
+# the same public API as HasamiShogiGame, so it can be used anywhere the list-of-objects game is used.
+# The board tables live in a BoardGeometry, so BitboardGame.variant(size, num_pieces) gives the same game on any
+# N x N board (up to 26 x 26) with any number of pieces per side. Run this file to benchmark BitboardGame against
+# HasamiShogiGame, HasamiShogiGame.make_move against make_move_idx, and to see how move generation and captures
+# scale with the board size.
+
+import random
+import time
+
+from HasamiShogiGame import HasamiShogiGame, SQUARE_INDEX as _GAME_SQUARE_INDEX, ZOBRIST_SEED as _ZOBRIST_SEED
+
+_ROW_LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+
+class BoardGeometry:
+    """Represents the square names, masks, rays and hash keys of an N x N board. Square (row, column) is bit
+    row * N + column. Rows are named by letters from 'a' and columns by numbers from '1', so N is at most 26."""
+
+    def __init__(self, size):
+        """Builds the tables of a size x size board"""
+        if not 3 <= size <= len(_ROW_LETTERS):
+            raise ValueError(f"board size must be between 3 and {len(_ROW_LETTERS)}, not {size}")
+        self.size = size
+        self.num_squares = size * size
+        self.square_names = [letter + str(column + 1) for letter in _ROW_LETTERS[:size] for column in range(size)]
+        self.square_index = {name: index for index, name in enumerate(self.square_names)}
+        self.row_masks = [((1 << size) - 1) << (row * size) for row in range(size)]
+        self.column_masks = [sum(1 << (row * size + column) for row in range(size)) for column in range(size)]
+        self.full_mask = (1 << self.num_squares) - 1
+
+        # squares walking outward from each square in each direction (up, down, left, right)
+        self.ray_squares = []
+        for index in range(self.num_squares):
+            row, column = divmod(index, size)
+            self.ray_squares.append((tuple(r * size + column for r in range(row - 1, -1, -1)),
+                                     tuple(r * size + column for r in range(row + 1, size)),
+                                     tuple(row * size + c for c in range(column - 1, -1, -1)),
+                                     tuple(row * size + c for c in range(column + 1, size))))
+        self.rays = [tuple(tuple(1 << index for index in ray) for ray in rays) for rays in self.ray_squares]
+        # (bit, index) pairs walking outward from each square, used by the move generator
+        self.slides = [tuple(tuple((1 << index, index) for index in ray) for ray in rays)
+                       for rays in self.ray_squares]
+        # squares strictly between two squares, or -1 when they do not share a row or column
+        self.between = [[-1] * self.num_squares for _ in range(self.num_squares)]
+        for from_index in range(self.num_squares):
+            for ray in self.rays[from_index]:
+                path = 0
+                for bit in ray:
+                    self.between[from_index][bit.bit_length() - 1] = path
+                    path |= bit
+
+        # moving onto a square next to a corner captures the opponent piece in the corner when a friendly piece
+        # holds the corner's other neighbour
+        self.corner_captures = {}
+        last = size - 1
+        for corner_row, corner_column, step_row, step_column in ((0, 0, 1, 1), (0, last, 1, -1),
+                                                                 (last, 0, -1, 1), (last, last, -1, -1)):
+            corner = corner_row * size + corner_column
+            beside = corner_row * size + corner_column + step_column        # same row
+            below = (corner_row + step_row) * size + corner_column          # same column
+            self.corner_captures[beside] = (1 << corner, 1 << below)
+            self.corner_captures[below] = (1 << corner, 1 << beside)
+
+        # 64-bit Zobrist keys, one per square per color plus one for RED to move. A fixed seed keeps keys stable
+        # across runs so hashes can be stored on disk; it is offset by the size so 9x9 keeps its original keys.
+        zobrist_random = random.Random(_ZOBRIST_SEED + size - 9)
+        self.zobrist_black = [zobrist_random.getrandbits(64) for _ in range(self.num_squares)]
+        self.zobrist_red = [zobrist_random.getrandbits(64) for _ in range(self.num_squares)]
+        self.zobrist_red_to_move = zobrist_random.getrandbits(64)
+
+    def index(self, row, column):
+        """Returns the index of square (row, column), or None if it is off the board"""
+        if 0 <= row < self.size and 0 <= column < self.size:
+            return row * self.size + column
+        return None
+
+    def coordinates(self, index):
+        """Returns the (row, column) of a square index"""
+        return divmod(index, self.size)
+
+    def home_row(self, row, num_pieces):
+        """Returns the bitboard of num_pieces pieces centred on a row"""
+        first = (self.size - num_pieces) // 2
+        return ((1 << num_pieces) - 1) << (row * self.size + first)
+
+    def compute_zobrist_key(self, black_board, red_board, active_player):
+        """Returns the Zobrist key of a position computed from scratch"""
+        key = self.zobrist_red_to_move if active_player == 'RED' else 0
+        for index in range(self.num_squares):
+            if black_board >> index & 1:
+                key ^= self.zobrist_black[index]
+            elif red_board >> index & 1:
+                key ^= self.zobrist_red[index]
+        return key
+
+    def find_captures(self, to_index, own_board, opponent_board):
+        """Returns the bitboard of opponent pieces captured by a piece that has just moved to to_index"""
+        captured = 0
+        for ray in self.rays[to_index]:
+            run = 0
+            for bit in ray:
+                if opponent_board & bit:
+                    run |= bit
+                else:
+                    if run and own_board & bit:     # run of opponent pieces closed by a friendly piece
+                        captured |= run
+                    break
+
+        corner = self.corner_captures.get(to_index)
+        if corner is not None:
+            corner_bit, partner_bit = corner
+            if opponent_board & corner_bit and own_board & partner_bit:
+                captured |= corner_bit
+
+        return captured
+
+
+_GEOMETRIES = {}
+
+
+def board_geometry(size):
+    """Returns the (shared) BoardGeometry of a size x size board"""
+    geometry = _GEOMETRIES.get(size)
+    if geometry is None:
+        geometry = _GEOMETRIES[size] = BoardGeometry(size)
+    return geometry
+
+
+# the standard 9x9 board, used by every module that does not ask for another size
+STANDARD_GEOMETRY = board_geometry(9)
+BOARD_SIZE = STANDARD_GEOMETRY.size
+NUM_SQUARES = STANDARD_GEOMETRY.num_squares
+ROW_LETTERS = _ROW_LETTERS[:BOARD_SIZE]
+SQUARE_NAMES = STANDARD_GEOMETRY.square_names
+SQUARE_INDEX = STANDARD_GEOMETRY.square_index
+ROW_MASKS = STANDARD_GEOMETRY.row_masks
+COLUMN_MASKS = STANDARD_GEOMETRY.column_masks
+FULL_MASK = STANDARD_GEOMETRY.full_mask
+SLIDES = STANDARD_GEOMETRY.slides
+ZOBRIST_BLACK = STANDARD_GEOMETRY.zobrist_black
+ZOBRIST_RED = STANDARD_GEOMETRY.zobrist_red
+ZOBRIST_RED_TO_MOVE = STANDARD_GEOMETRY.zobrist_red_to_move
+compute_zobrist_key = STANDARD_GEOMETRY.compute_zobrist_key
+find_captures = STANDARD_GEOMETRY.find_captures
+
+
+class BitboardGame:
+    """Represents a game of Hasami Shogi (variant 1) stored as one bitboard per color"""
+
+    _geometry = STANDARD_GEOMETRY   # board tables; variant() makes subclasses for other sizes
+    _num_pieces = BOARD_SIZE        # pieces per side at the start
+    _variants = {}
+
+    def __init__(self):
+        """Creates a game of Hasami Shogi with pieces in the starting position"""
+        geometry = self._geometry
+        self._black_board = geometry.home_row(geometry.size - 1, self._num_pieces)   # row 'i' on 9x9
+        self._red_board = geometry.home_row(0, self._num_pieces)                     # row 'a'
+        self._game_state = 'UNFINISHED'     # can be 'UNFINISHED', 'RED_WON', 'BLACK_WON'
+        self._active_player = 'BLACK'   # player either BLACK or RED. BLACK gets first move
+        self._black_captured_pieces = 0
+        self._red_captured_pieces = 0
+        self._zobrist_key = geometry.compute_zobrist_key(self._black_board, self._red_board, self._active_player)
+        self._move_stack = []   # one (move bits, captured bits, previous game state, previous key) record per move
+
+    @classmethod
+    def from_boards(cls, black_board, red_board, active_player='BLACK', black_captured_pieces=None,
+                    red_captured_pieces=None, game_state=None):
+        """Returns a BitboardGame with the given bitboards. Captured counts default to the pieces missing from the
+        board and the game state to the one the captured counts imply."""
+        bitboard_game = cls()
+        if black_captured_pieces is None:
+            black_captured_pieces = cls._num_pieces - black_board.bit_count()
+        if red_captured_pieces is None:
+            red_captured_pieces = cls._num_pieces - red_board.bit_count()
+        bitboard_game._black_board = black_board
+        bitboard_game._red_board = red_board
+        bitboard_game._active_player = active_player
+        bitboard_game._black_captured_pieces = black_captured_pieces
+        bitboard_game._red_captured_pieces = red_captured_pieces
+        if game_state is None:
+            bitboard_game._check_winner()
+        else:
+            bitboard_game._game_state = game_state
+        bitboard_game._zobrist_key = cls._geometry.compute_zobrist_key(black_board, red_board, active_player)
+        return bitboard_game
+
+    @classmethod
+    def from_game(cls, game):
+        """Returns a BitboardGame with the same position, captures, active player and state as game"""
+        black_board = red_board = 0
+        for index, square in enumerate(cls._geometry.square_names):
+            occupant = game.get_square_occupant(square)
+            if occupant == 'BLACK':
+                black_board |= 1 << index
+            elif occupant == 'RED':
+                red_board |= 1 << index
+        return cls.from_boards(black_board, red_board, game.get_active_player(),
+                               game.get_num_captured_pieces('BLACK'), game.get_num_captured_pieces('RED'),
+                               game.get_game_state())
+
+    def get_game_state(self):
+        """Returns the current state of the game"""
+        return self._game_state
+
+    def get_active_player(self):
+        """Returns the active player"""
+        return self._active_player
+
+    def get_num_captured_pieces(self, color):
+        """Returns the number of captured pieces of a given color"""
+        if color == 'BLACK':
+            return self._black_captured_pieces
+
+        if color == 'RED':
+            return self._red_captured_pieces
+
+    def get_square_occupant(self, square):
+        """Returns color of piece if square is occupied. Otherwise, returns 'NONE'."""
+        index = self._geometry.square_index.get(square)
+        if index is not None:
+            bit = 1 << index
+            if self._black_board & bit:
+                return 'BLACK'
+            if self._red_board & bit:
+                return 'RED'
+        return 'NONE'
+
+    def get_zobrist_key(self):
+        """Returns the 64-bit Zobrist key of the current position and side to move"""
+        return self._zobrist_key
+
+    def get_boards(self):
+        """Returns the (black, red) bitboards"""
+        return self._black_board, self._red_board
+
+    @classmethod
+    def get_geometry(cls):
+        """Returns the BoardGeometry of this game's board"""
+        return cls._geometry
+
+    @classmethod
+    def get_num_pieces(cls):
+        """Returns the number of pieces each side starts with"""
+        return cls._num_pieces
+
+    @classmethod
+    def variant(cls, board_size, num_pieces=None):
+        """Returns the BitboardGame class for a board_size x board_size board with num_pieces pieces per side
+        (default board_size) centred on the home rows. A side loses when it is down to one piece."""
+        if num_pieces is None:
+            num_pieces = board_size
+        if board_size == BOARD_SIZE and num_pieces == BOARD_SIZE:
+            return BitboardGame
+        if not 2 <= num_pieces <= board_size:
+            raise ValueError(f"a side needs between 2 and {board_size} pieces, not {num_pieces}")
+        variant_class = cls._variants.get((board_size, num_pieces))
+        if variant_class is None:
+            variant_class = type(f"BitboardGame{board_size}x{board_size}_{num_pieces}", (BitboardGame,),
+                                 {'_geometry': board_geometry(board_size), '_num_pieces': num_pieces})
+            cls._variants[(board_size, num_pieces)] = variant_class
+        return variant_class
+
+    def _moves_from_index(self, from_index, occupied, moves):
+        """Appends (from_index, to_index) for every square the piece on from_index can slide to"""
+        for ray in self._geometry.slides[from_index]:
+            for bit, to_index in ray:
+                if occupied & bit:
+                    break
+                moves.append((from_index, to_index))
+
+    def legal_move_indices(self, color=None):
+        """Returns every (from_index, to_index) move for the pieces of color (the active player by default)"""
+        if self._game_state != 'UNFINISHED':
+            return []
+        if color is None:
+            color = self._active_player
+        board = self._black_board if color == 'BLACK' else self._red_board
+        occupied = self._black_board | self._red_board
+        moves = []
+        while board:
+            low_bit = board & -board
+            self._moves_from_index(low_bit.bit_length() - 1, occupied, moves)
+            board ^= low_bit
+        return moves
+
+    def legal_moves(self, color=None):
+        """Returns every (from_square, to_square) move for the pieces of color (the active player by default)"""
+        square_names = self._geometry.square_names
+        return [(square_names[from_index], square_names[to_index])
+                for from_index, to_index in self.legal_move_indices(color)]
+
+    def legal_moves_from(self, square):
+        """Returns every (from_square, to_square) move for the piece on square, or an empty list if there is none"""
+        from_index = self._geometry.square_index.get(square)
+        if self._game_state != 'UNFINISHED' or from_index is None:
+            return []
+        occupied = self._black_board | self._red_board
+        if not occupied >> from_index & 1:
+            return []
+        moves = []
+        self._moves_from_index(from_index, occupied, moves)
+        square_names = self._geometry.square_names
+        return [(square_names[from_index], square_names[to_index]) for from_index, to_index in moves]
+
+    def get_move_captures(self, move):
+        """Returns the bitboard of pieces the active player would capture with move, without making the move"""
+        from_index, to_index = move
+        if self._active_player == 'BLACK':
+            own_board, opponent_board = self._black_board, self._red_board
+        else:
+            own_board, opponent_board = self._red_board, self._black_board
+        return self._geometry.find_captures(to_index, own_board ^ (1 << from_index | 1 << to_index), opponent_board)
+
+    def _check_winner(self):
+        """Checks to see if the game has been won"""
+        if self._black_captured_pieces >= self._num_pieces - 1:
+            self._game_state = 'RED_WON'
+
+        elif self._red_captured_pieces >= self._num_pieces - 1:
+            self._game_state = 'BLACK_WON'
+
+    def make_move(self, from_square, to_square):
+        """Moves player piece from given square to new given square if valid, without keeping a record to pop"""
+        square_index = self._geometry.square_index
+        from_index = square_index.get(from_square)
+        to_index = square_index.get(to_square)
+        if from_index is None or to_index is None:
+            return False
+        return self.push((from_index, to_index), False)
+
+    def make_coordinate_move(self, from_coordinates, to_coordinates):
+        """Makes a move given as (row, column) pairs counted from 0, where row 0 is 'a', without keeping a record
+        to pop. Returns True if made."""
+        from_index = self._geometry.index(*from_coordinates)
+        to_index = self._geometry.index(*to_coordinates)
+        if from_index is None or to_index is None:
+            return False
+        return self.push((from_index, to_index), False)
+
+    def push(self, move, record=True):
+        """Makes move, a (from_index, to_index) pair, if valid and, unless record is False, records how to undo it.
+        Returns True if made. Raises ValueError if an index is not a square index."""
+        geometry = self._geometry
+        from_index, to_index = move
+        if not (0 <= from_index < geometry.num_squares and 0 <= to_index < geometry.num_squares):
+            raise ValueError(f"square index out of range in move {move}")
+        if self._game_state != 'UNFINISHED':
+            return False
+
+        path = geometry.between[from_index][to_index]
+        if path < 0:
+            return False    # not in the same row or column
+
+        if self._active_player == 'BLACK':
+            own_board, opponent_board = self._black_board, self._red_board
+        else:
+            own_board, opponent_board = self._red_board, self._black_board
+
+        from_bit = 1 << from_index
+        to_bit = 1 << to_index
+        if not own_board & from_bit:
+            return False
+        if (own_board | opponent_board) & (path | to_bit):
+            return False    # destination occupied or path blocked
+
+        own_board ^= from_bit | to_bit
+        captured = geometry.find_captures(to_index, own_board, opponent_board)
+        opponent_board ^= captured
+        num_captured = captured.bit_count()
+
+        # the undo record holds only the deltas: the two changed bits, the captured pieces and the previous state
+        if record:
+            self._move_stack.append((from_bit | to_bit, captured, self._game_state, self._zobrist_key))
+
+        if self._active_player == 'BLACK':
+            self._black_board, self._red_board = own_board, opponent_board
+            self._red_captured_pieces += num_captured
+            self._active_player = 'RED'
+            own_keys, opponent_keys = geometry.zobrist_black, geometry.zobrist_red
+        else:
+            self._red_board, self._black_board = own_board, opponent_board
+            self._black_captured_pieces += num_captured
+            self._active_player = 'BLACK'
+            own_keys, opponent_keys = geometry.zobrist_red, geometry.zobrist_black
+
+        key = self._zobrist_key ^ own_keys[from_index] ^ own_keys[to_index] ^ geometry.zobrist_red_to_move
+        while captured:
+            low_bit = captured & -captured
+            key ^= opponent_keys[low_bit.bit_length() - 1]
+            captured ^= low_bit
+        self._zobrist_key = key
+
+        self._check_winner()
+        return True
+
+    def validate_moves(self, moves):
+        """Returns a (valid, reason) pair for every (from_square, to_square) move in moves, without changing the
+        game. The reasons are those of HasamiShogiGame.validate_moves."""
+        if self._game_state != 'UNFINISHED':
+            return [(False, 'game_over')] * len(moves)
+        own_board = self._black_board if self._active_player == 'BLACK' else self._red_board
+        occupied = self._black_board | self._red_board
+        square_index = self._geometry.square_index
+        between = self._geometry.between
+
+        results = []
+        for from_square, to_square in moves:
+            from_index = square_index.get(from_square)
+            if from_index is None or not own_board >> from_index & 1:
+                results.append((False, 'not_your_piece'))
+                continue
+            to_index = square_index.get(to_square)
+            if to_index is None:
+                results.append((False, 'off_board'))
+            elif occupied >> to_index & 1:
+                results.append((False, 'occupied'))
+            elif between[from_index][to_index] < 0:
+                results.append((False, 'not_in_line'))
+            elif between[from_index][to_index] & occupied:
+                results.append((False, 'blocked'))
+            else:
+                results.append((True, 'ok'))
+        return results
+
+    def pop(self):
+        """Undoes the most recent move and restores the previous position exactly"""
+        move_bits, captured, game_state, zobrist_key = self._move_stack.pop()
+        num_captured = captured.bit_count()
+        self._game_state = game_state
+        self._zobrist_key = zobrist_key
+
+        if self._active_player == 'RED':     # BLACK made the move being undone
+            self._black_board ^= move_bits
+            self._red_board |= captured
+            self._red_captured_pieces -= num_captured
+            self._active_player = 'BLACK'
+        else:
+            self._red_board ^= move_bits
+            self._black_board |= captured
+            self._black_captured_pieces -= num_captured
+            self._active_player = 'RED'
+
+    def get_move_count(self):
+        """Returns the number of moves that can be undone with pop"""
+        return len(self._move_stack)
+
+
+def random_game(seed, max_moves=200, game_class=None):
+    """Plays random moves on a BitboardGame (or a variant() class) and returns the list of (from_square, to_square)
+    pairs played"""
+    rng = random.Random(seed)
+    game = (game_class or BitboardGame)()
+    moves = []
+    while game.get_game_state() == 'UNFINISHED' and len(moves) < max_moves:
+        legal_moves = game.legal_moves()
+        if not legal_moves:
+            break
+        move = rng.choice(legal_moves)
+        game.make_move(*move)
+        moves.append(move)
+    return moves
+
+
+def _replay(game_class, games):
+    """Replays each game on a fresh instance of game_class and returns (seconds, final states and Zobrist keys)"""
+    final_states = []
+    start = time.perf_counter()
+    for moves in games:
+        game = game_class()
+        for from_square, to_square in moves:
+            game.make_move(from_square, to_square)
+        final_states.append((game.get_game_state(),
+                             game.get_num_captured_pieces('BLACK'),
+                             game.get_num_captured_pieces('RED'),
+                             game.get_zobrist_key()))
+    return time.perf_counter() - start, final_states
+
+
+def benchmark(num_games=200, seed=0):
+    """Replays the same random games on HasamiShogiGame and BitboardGame and prints move throughput, checking that
+    both cores reach the same states and Zobrist keys, list the same legal moves, that HasamiShogiGame.features()
+    matches a full recompute through pushes and pops, and that HasamiShogiGame.pop undoes its pushes"""
+    games = [random_game(seed + number) for number in range(num_games)]
+    num_moves = sum(len(moves) for moves in games)
+
+    list_seconds, list_states = _replay(HasamiShogiGame, games)
+    bitboard_seconds, bitboard_states = _replay(BitboardGame, games)
+    if list_states != bitboard_states:
+        raise AssertionError('BitboardGame and HasamiShogiGame disagree on the benchmark games')
+
+    print(f"{num_games} games, {num_moves} moves")
+    print(f"HasamiShogiGame: {num_moves / list_seconds:12.0f} moves/sec")
+    print(f"BitboardGame:    {num_moves / bitboard_seconds:12.0f} moves/sec")
+    print(f"speedup:         {list_seconds / bitboard_seconds:12.1f}x")
+
+    positions = []
+    list_positions = []
+    for moves in games:
+        game = BitboardGame()
+        list_game = HasamiShogiGame()
+        for from_square, to_square in moves[:len(moves) // 2]:
+            game.make_move(from_square, to_square)
+            list_game.push((SQUARE_INDEX[from_square], SQUARE_INDEX[to_square]))
+        positions.append(game)
+        list_positions.append(list_game)
+    for game, list_game in zip(positions, list_positions):
+        if game.legal_moves() != list_game.legal_moves() or game.legal_moves('RED') != list_game.legal_moves('RED') \
+                or game.legal_moves_from('e5') != list_game.legal_moves_from('e5'):
+            raise AssertionError('BitboardGame and HasamiShogiGame disagree on legal moves')
+        if game.get_zobrist_key() != list_game.get_zobrist_key():
+            raise AssertionError('BitboardGame and HasamiShogiGame disagree on the Zobrist key')
+    list_start = time.perf_counter()
+    for list_game in list_positions:
+        list_game.legal_moves()
+    list_seconds = time.perf_counter() - list_start
+    start = time.perf_counter()
+    num_generated = sum(len(game.legal_moves()) for game in positions)
+    seconds = time.perf_counter() - start
+    print(f"legal_moves:     {seconds / len(positions) * 1e6:12.1f} us/position "
+          f"({num_generated / len(positions):.0f} moves/position, HasamiShogiGame "
+          f"{list_seconds / len(positions) * 1e6:.1f} us)")
+
+    from EvaluationFeatures import cross_check as check_features     # imported here as it builds on this module
+    check_features(20, seed)
+
+    start_moves = HasamiShogiGame().legal_moves()
+    start_key = BitboardGame().get_zobrist_key()
+    for list_game in list_positions:
+        while list_game.get_move_count():
+            list_game.pop()
+        if list_game.legal_moves() != start_moves or list_game.get_num_captured_pieces('RED') != 0 \
+                or list_game.get_zobrist_key() != start_key:
+            raise AssertionError('HasamiShogiGame.pop did not restore the starting position')
+
+
+def benchmark_move_paths(num_games=200, seed=0):
+    """Replays the same random games on HasamiShogiGame with make_move (square names) and make_move_idx (square
+    indices) and prints the cost per move of each path, for legal moves and for rejected ones"""
+    games = [random_game(seed + number) for number in range(num_games)]
+    index_games = [[(_GAME_SQUARE_INDEX[from_square], _GAME_SQUARE_INDEX[to_square])
+                    for from_square, to_square in moves] for moves in games]
+    num_moves = sum(len(moves) for moves in games)
+
+    results = {}
+    for name, method, move_lists in (('make_move', HasamiShogiGame.make_move, games),
+                                     ('make_move_idx', HasamiShogiGame.make_move_idx, index_games)):
+        made_seconds = rejected_seconds = 0.0
+        final_states = []
+        for moves in move_lists:
+            game = HasamiShogiGame()
+            for from_square, to_square in moves:
+                start = time.perf_counter()
+                method(game, to_square, from_square)       # never legal: not the active player's piece or occupied
+                middle = time.perf_counter()
+                method(game, from_square, to_square)
+                made_seconds += time.perf_counter() - middle
+                rejected_seconds += middle - start
+            final_states.append((game.get_game_state(), game.get_num_captured_pieces('BLACK'),
+                                 game.get_num_captured_pieces('RED')))
+        results[name] = (made_seconds, rejected_seconds, final_states)
+    if results['make_move'][2] != results['make_move_idx'][2]:
+        raise AssertionError('make_move and make_move_idx disagree on the benchmark games')
+
+    print(f"{num_games} games, {num_moves} moves     legal move   rejected move")
+    for name, (made_seconds, rejected_seconds, _) in results.items():
+        print(f"HasamiShogiGame.{name + ':':14s} {made_seconds / num_moves * 1e6:8.2f} us "
+              f"{rejected_seconds / num_moves * 1e6:11.2f} us")
+
+
+def benchmark_board_sizes(sizes=(9, 13, 19), num_games=50, seed=0):
+    """Prints how move generation and move making with captures scale with the board size, on positions from the
+    middle of random games"""
+    print("size  squares  moves/position  legal_move_indices   push+pop (with captures)")
+    for size in sizes:
+        game_class = BitboardGame.variant(size)
+        positions = []
+        for number in range(num_games):
+            moves = random_game(seed + number, 4 * size * size, game_class)
+            game = game_class()
+            for from_square, to_square in moves[:len(moves) // 2]:
+                game.make_move(from_square, to_square)
+            positions.append(game)
+
+        start = time.perf_counter()
+        all_moves = [game.legal_move_indices() for game in positions]
+        generate_seconds = time.perf_counter() - start
+        num_moves = sum(len(moves) for moves in all_moves)
+
+        start = time.perf_counter()
+        for game, moves in zip(positions, all_moves):
+            for move in moves:
+                game.push(move)
+                game.pop()
+        make_seconds = time.perf_counter() - start
+
+        print(f"{size:4d} {size * size:8d} {num_moves / len(positions):15.0f} "
+              f"{generate_seconds / len(positions) * 1e6:14.1f} us/pos {make_seconds / num_moves * 1e6:14.2f} us/move")
+
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark_move_paths()
+    benchmark_board_sizes()
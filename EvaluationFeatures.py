@@ -0,0 +1,220 @@
+# Description: evaluation features of a Hasami Shogi (Variant 1) position, kept up to date move by move.
+# For each color the features are:
+#     mobility    number of legal moves
+#     threatened  number of pieces the opponent could capture with one move
+#     edge        pieces on the edge of the board, corners excluded
+#     corner      pieces in a corner (exposed to the corner capture)
+# FeatureTracker reads the base-3 line pattern of each row and column (0 empty, 1 BLACK, 2 RED) that HasamiShogiGame
+# already keeps for its line capture table, and keeps a per-pattern summary: mobility, the squares each color can
+# slide to along the line, and the runs of pieces that a piece landing on an empty square of the line would
+# sandwich. After a move the game passes the square indices it changed, and only their rows and columns are
+# re-summarized. HasamiShogiGame.features() creates a tracker on first use and updates it from make_move. Run this
+# file (or BitboardGame.py) to check the tracker against a full recompute.
+
+import time
+
+from BitboardGame import BitboardGame, BOARD_SIZE, SQUARE_INDEX, ROW_MASKS, COLUMN_MASKS, random_game
+
+_POWERS_OF_3 = [3 ** position for position in range(BOARD_SIZE)]
+_OTHER = {1: 2, 2: 1}
+_COLOR_NAMES = ('BLACK', 'RED')     # digit 1 and digit 2
+
+# bits of column 0 of a bitboard for every 9-bit mask along a column
+_COLUMN_SPREAD = [sum(1 << (position * BOARD_SIZE) for position in range(BOARD_SIZE) if mask >> position & 1)
+                  for mask in range(1 << BOARD_SIZE)]
+
+CORNER_MASK = sum(1 << SQUARE_INDEX[square] for square in ('a1', 'a9', 'i1', 'i9'))
+EDGE_MASK = (ROW_MASKS[0] | ROW_MASKS[BOARD_SIZE - 1] | COLUMN_MASKS[0] | COLUMN_MASKS[BOARD_SIZE - 1]) & ~CORNER_MASK
+
+# (corner, partner, partner) squares: a piece in the corner is captured when the opponent holds one partner square
+# and moves onto the other
+_CORNER_PARTNERS = tuple((SQUARE_INDEX[corner], SQUARE_INDEX[first], SQUARE_INDEX[second])
+                         for corner, first, second in (('a1', 'a2', 'b1'), ('a9', 'a8', 'b9'),
+                                                       ('i1', 'i2', 'h1'), ('i9', 'i8', 'h9')))
+
+# per line pattern: (BLACK mobility, RED mobility, (BLACK reach, RED reach), (BLACK mask, RED mask), threats) where
+# reach masks are the squares a color can slide to along the line and threats is a tuple of
+# (empty position, run mask, victim digit). Entries are computed the first time a pattern is seen.
+_LINE_SUMMARIES = [None] * 3 ** BOARD_SIZE
+
+
+def _summarize_line(pattern):
+    """Returns the line summary of a base-3 line pattern"""
+    cells = [pattern // power % 3 for power in _POWERS_OF_3]
+    mobility = [0, 0, 0]
+    reach = [0, 0, 0]
+    masks = [0, 0, 0]
+    for position, cell in enumerate(cells):
+        if not cell:
+            continue
+        masks[cell] |= 1 << position
+        for step in (-1, 1):
+            target = position + step
+            while 0 <= target < BOARD_SIZE and not cells[target]:
+                mobility[cell] += 1
+                reach[cell] |= 1 << target
+                target += step
+
+    threats = []
+    position = 0
+    while position < BOARD_SIZE:
+        cell = cells[position]
+        if not cell:
+            position += 1
+            continue
+        end = position
+        while end + 1 < BOARD_SIZE and cells[end + 1] == cell:
+            end += 1
+        run = ((1 << (end + 1)) - 1) ^ ((1 << position) - 1)
+        if position > 0 and end + 1 < BOARD_SIZE:
+            left, right = cells[position - 1], cells[end + 1]
+            if left == _OTHER[cell] and not right:
+                threats.append((end + 1, run, cell))
+            elif right == _OTHER[cell] and not left:
+                threats.append((position - 1, run, cell))
+        position = end + 1
+
+    return mobility[1], mobility[2], (reach[1], reach[2]), (masks[1], masks[2]), tuple(threats)
+
+
+def _line_summary(pattern):
+    """Returns the (cached) line summary of a base-3 line pattern"""
+    summary = _LINE_SUMMARIES[pattern]
+    if summary is None:
+        summary = _LINE_SUMMARIES[pattern] = _summarize_line(pattern)
+    return summary
+
+
+class FeatureTracker:
+    """Represents the evaluation features of a position, updated incrementally as moves are made"""
+
+    def __init__(self, rows, columns):
+        """Creates a tracker reading the lists of base-3 row patterns (digit per column) and column patterns (digit
+        per row) of a position. The lists are not copied: their owner changes them and then calls move."""
+        self._rows = rows
+        self._columns = columns
+        self._row_summaries = [_line_summary(pattern) for pattern in self._rows]
+        self._column_summaries = [_line_summary(pattern) for pattern in self._columns]
+        self._mobility = [sum(summary[digit] for summary in self._row_summaries + self._column_summaries)
+                          for digit in (0, 1)]
+
+    def move(self, from_index, to_index, captured=()):
+        """Updates the features after the patterns changed by a move from square index from_index to to_index that
+        captured the square indices in captured, re-summarizing only the rows and columns of those squares"""
+        from_row, from_column = divmod(from_index, BOARD_SIZE)
+        to_row, to_column = divmod(to_index, BOARD_SIZE)
+        rows = {from_row, to_row}
+        columns = {from_column, to_column}
+        for index in captured:
+            rows.add(index // BOARD_SIZE)
+            columns.add(index % BOARD_SIZE)
+
+        mobility = self._mobility
+        for lines, patterns, summaries in ((rows, self._rows, self._row_summaries),
+                                           (columns, self._columns, self._column_summaries)):
+            for line in lines:
+                old = summaries[line]
+                new = summaries[line] = _line_summary(patterns[line])
+                mobility[0] += new[0] - old[0]
+                mobility[1] += new[1] - old[1]
+
+    def features(self):
+        """Returns {'BLACK': {...}, 'RED': {...}} with the mobility, threatened, edge and corner counts of each
+        color"""
+        boards = [0, 0]
+        reach = [0, 0]
+        for row, summary in enumerate(self._row_summaries):
+            shift = row * BOARD_SIZE
+            for color in (0, 1):
+                boards[color] |= summary[3][color] << shift
+                reach[color] |= summary[2][color] << shift
+        for column, summary in enumerate(self._column_summaries):
+            for color in (0, 1):
+                reach[color] |= _COLUMN_SPREAD[summary[2][color]] << column
+
+        # a run is threatened when an opponent piece can slide onto the empty square that closes the sandwich
+        threatened = [0, 0]
+        for row, summary in enumerate(self._row_summaries):
+            for position, run, victim in summary[4]:
+                if reach[2 - victim] >> (row * BOARD_SIZE + position) & 1:
+                    threatened[victim - 1] |= run << (row * BOARD_SIZE)
+        for column, summary in enumerate(self._column_summaries):
+            for position, run, victim in summary[4]:
+                if reach[2 - victim] >> (position * BOARD_SIZE + column) & 1:
+                    threatened[victim - 1] |= _COLUMN_SPREAD[run] << column
+        for corner, first, second in _CORNER_PARTNERS:
+            for victim in (0, 1):
+                opponent = 1 - victim
+                if boards[victim] >> corner & 1:
+                    if boards[opponent] >> first & 1 and reach[opponent] >> second & 1 \
+                            or boards[opponent] >> second & 1 and reach[opponent] >> first & 1:
+                        threatened[victim] |= 1 << corner
+
+        return {_COLOR_NAMES[color]: {'mobility': self._mobility[color],
+                                      'threatened': threatened[color].bit_count(),
+                                      'edge': (boards[color] & EDGE_MASK).bit_count(),
+                                      'corner': (boards[color] & CORNER_MASK).bit_count()}
+                for color in (0, 1)}
+
+
+def compute_features(game):
+    """Returns the features of a game's position computed from scratch by generating every move of both colors
+    and the captures each would make"""
+    black_board, red_board = BitboardGame.from_game(game).get_boards()
+    result = {}
+    for color, opponent, board in (('BLACK', 'RED', black_board), ('RED', 'BLACK', red_board)):
+        mover = BitboardGame.from_boards(black_board, red_board, color, 0, 0, 'UNFINISHED')
+        attacker = BitboardGame.from_boards(black_board, red_board, opponent, 0, 0, 'UNFINISHED')
+        threatened = 0
+        for move in attacker.legal_move_indices():
+            threatened |= attacker.get_move_captures(move)
+        result[color] = {'mobility': len(mover.legal_move_indices()),
+                         'threatened': threatened.bit_count(),
+                         'edge': (board & EDGE_MASK).bit_count(),
+                         'corner': (board & CORNER_MASK).bit_count()}
+    return result
+
+
+def cross_check(num_games=200, seed=0):
+    """Plays random games on HasamiShogiGame with push, then undoes them with pop, and compares features() with
+    compute_features after every move and undo. Raises AssertionError on the first difference."""
+    from HasamiShogiGame import HasamiShogiGame
+    num_positions = 0
+    for number in range(num_games):
+        game = HasamiShogiGame()
+        game.features()     # start tracking from the first position
+        for from_square, to_square in random_game(seed + number):
+            game.push((SQUARE_INDEX[from_square], SQUARE_INDEX[to_square]))
+            assert game.features() == compute_features(game), (number, from_square, to_square)
+            num_positions += 1
+        while game.get_move_count():
+            game.pop()
+            assert game.features() == compute_features(game), (number, 'pop', game.get_move_count())
+            num_positions += 1
+    print(f"cross-check passed: features() matches a full recompute on {num_positions} positions")
+
+
+def benchmark(num_games=20, seed=0):
+    """Prints the cost of features() after each move of random games against a full recompute"""
+    from HasamiShogiGame import HasamiShogiGame
+    seconds = recompute_seconds = 0.0
+    count = 0
+    for number in range(num_games):
+        game = HasamiShogiGame()
+        game.features()
+        for from_square, to_square in random_game(seed + number):
+            game.make_move(from_square, to_square)
+            start = time.perf_counter()
+            game.features()
+            seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            compute_features(game)
+            recompute_seconds += time.perf_counter() - start
+            count += 1
+    print(f"features():         {seconds / count * 1e6:8.1f} us/position")
+    print(f"compute_features(): {recompute_seconds / count * 1e6:8.1f} us/position")
+
+
+if __name__ == "__main__":
+    cross_check()
+    benchmark()
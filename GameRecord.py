@@ -0,0 +1,261 @@
+# Description: compact binary game records for archiving Hasami Shogi (Variant 1) games. A square is one byte
+# (its index 0..80, 'a1' = 0, 'i9' = 80), so a move is two bytes. An archive file is an 8-byte header followed by
+# one record per game:
+#     header:  b'HSGR', version (1 byte), 3 reserved bytes
+#     record:  number of moves (2 bytes, little endian), result (1 byte), then 2 bytes per move
+# GameRecordWriter appends records, read_games and replay_games stream them back one game at a time, and
+# GameArchive memory-maps a file for random access to game N.
+
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import tempfile
+import time
+
+from BitboardGame import BitboardGame, SQUARE_NAMES, SQUARE_INDEX, random_game
+
+MAGIC = b'HSGR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sB3x')
+RECORD_HEADER = struct.Struct('<HB')
+
+RESULT_CODES = {'UNFINISHED': 0, 'BLACK_WON': 1, 'RED_WON': 2}
+RESULT_NAMES = {code: name for name, code in RESULT_CODES.items()}
+
+
+def encode_moves(moves):
+    """Returns the bytes of a list of (from_square, to_square) moves"""
+    return bytes(SQUARE_INDEX[square] for move in moves for square in move)
+
+
+def _check_moves(data, num_moves):
+    """Raises ValueError unless data holds num_moves moves of valid square indices"""
+    if len(data) != 2 * num_moves:
+        raise ValueError(f"truncated game record: {len(data) // 2} of {num_moves} moves")
+    if data and max(data) >= len(SQUARE_NAMES):
+        raise ValueError(f"corrupt game record: square index {max(data)} is off the board")
+
+
+def decode_moves(data):
+    """Returns the list of (from_square, to_square) moves stored in data"""
+    return [(SQUARE_NAMES[data[offset]], SQUARE_NAMES[data[offset + 1]]) for offset in range(0, len(data), 2)]
+
+
+class GameRecordWriter:
+    """Represents an archive file open for appending game records"""
+
+    def __init__(self, path):
+        """Opens path for appending, writing the file header if the file is new or empty"""
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def write_game(self, moves, result='UNFINISHED'):
+        """Appends one game given as (from_square, to_square) moves and its final game state"""
+        self._file.write(RECORD_HEADER.pack(len(moves), RESULT_CODES[result]))
+        self._file.write(encode_moves(moves))
+
+    def close(self):
+        """Flushes and closes the archive"""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _check_header(header):
+    """Raises ValueError unless header is the header of a supported archive"""
+    if len(header) < FILE_HEADER.size:
+        raise ValueError("not a game record archive: file too short")
+    magic, version = FILE_HEADER.unpack(header[:FILE_HEADER.size])
+    if magic != MAGIC:
+        raise ValueError("not a game record archive: bad magic")
+    if version != VERSION:
+        raise ValueError(f"unsupported game record version {version}")
+
+
+def _unpack_record_header(header):
+    """Returns (number of moves, result name) of a record header. Raises ValueError if it is cut short or holds an
+    unknown result."""
+    if len(header) < RECORD_HEADER.size:
+        raise ValueError("truncated game record")
+    num_moves, result = RECORD_HEADER.unpack(header)
+    if result not in RESULT_NAMES:
+        raise ValueError(f"corrupt game record: unknown result code {result}")
+    return num_moves, RESULT_NAMES[result]
+
+
+def read_games(path):
+    """Yields (moves, result) for every game in an archive, reading one record at a time. Raises ValueError on a
+    truncated or corrupt record."""
+    with open(path, 'rb') as archive:
+        _check_header(archive.read(FILE_HEADER.size))
+        while True:
+            header = archive.read(RECORD_HEADER.size)
+            if not header:
+                return
+            num_moves, result = _unpack_record_header(header)
+            data = archive.read(2 * num_moves)
+            _check_moves(data, num_moves)
+            yield decode_moves(data), result
+
+
+def replay_games(path, game_class=BitboardGame):
+    """Yields a game_class instance with each archived game played out, streaming the archive. Raises ValueError on
+    a truncated or corrupt record."""
+    with open(path, 'rb') as archive:
+        _check_header(archive.read(FILE_HEADER.size))
+        while True:
+            header = archive.read(RECORD_HEADER.size)
+            if not header:
+                return
+            num_moves = _unpack_record_header(header)[0]
+            data = archive.read(2 * num_moves)
+            _check_moves(data, num_moves)
+            game = game_class()
+            # index moves skip square-name parsing on cores that support them; neither keeps undo records
+            if hasattr(game, 'make_move_idx'):
+                for offset in range(0, len(data), 2):
+                    game.make_move_idx(data[offset], data[offset + 1])
+            elif hasattr(game, 'push'):
+                for offset in range(0, len(data), 2):
+                    game.push((data[offset], data[offset + 1]), False)
+            else:
+                for offset in range(0, len(data), 2):
+                    game.make_move(SQUARE_NAMES[data[offset]], SQUARE_NAMES[data[offset + 1]])
+            yield game
+
+
+class GameArchive:
+    """Represents a memory-mapped archive with random access to game N"""
+
+    def __init__(self, path):
+        """Memory-maps the archive at path"""
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        _check_header(self._map)
+        self._offsets = None
+
+    def _build_offsets(self):
+        """Records the offset of every record by hopping from record header to record header. Raises ValueError if
+        the last record is cut short."""
+        offsets = []
+        offset = FILE_HEADER.size
+        size = len(self._map)
+        while offset < size:
+            num_moves = _unpack_record_header(self._map[offset:offset + RECORD_HEADER.size])[0]
+            offsets.append(offset)
+            offset += RECORD_HEADER.size + 2 * num_moves
+        if offset > size:
+            raise ValueError("truncated game record")
+        self._offsets = offsets
+
+    def __len__(self):
+        """Returns the number of games in the archive"""
+        if self._offsets is None:
+            self._build_offsets()
+        return len(self._offsets)
+
+    def get_game(self, number):
+        """Returns (moves, result) of game number. Raises ValueError if its record is truncated or corrupt."""
+        if self._offsets is None:
+            self._build_offsets()
+        offset = self._offsets[number]
+        start = offset + RECORD_HEADER.size
+        num_moves, result = _unpack_record_header(self._map[offset:start])
+        data = self._map[start:start + 2 * num_moves]
+        _check_moves(data, num_moves)
+        return decode_moves(data), result
+
+    def close(self):
+        """Unmaps and closes the archive"""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def pack_results(results_path, archive_path):
+    """Appends the games of a Tournament JSON-lines results file to an archive and returns the number written"""
+    count = 0
+    with open(results_path) as results_file, GameRecordWriter(archive_path) as writer:
+        for line in results_file:
+            if line.strip():
+                result = json.loads(line)
+                writer.write_game([(move[:2], move[2:]) for move in result['moves']], result['result'])
+                count += 1
+    return count
+
+
+def benchmark(num_games=2000, seed=0):
+    """Compares archive size and replay speed of binary records against JSON lists of square strings"""
+    games = [random_game(seed + number) for number in range(num_games)]
+    with tempfile.TemporaryDirectory() as directory:
+        binary_path = os.path.join(directory, 'games.hsg')
+        json_path = os.path.join(directory, 'games.jsonl')
+
+        with GameRecordWriter(binary_path) as writer:
+            for moves in games:
+                writer.write_game(moves)
+        with open(json_path, 'w') as json_file:
+            for moves in games:
+                json_file.write(json.dumps(moves) + '\n')
+
+        start = time.perf_counter()
+        for _ in replay_games(binary_path):
+            pass
+        binary_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(json_path) as json_file:
+            for line in json_file:
+                game = BitboardGame()
+                for from_square, to_square in json.loads(line):
+                    game.make_move(from_square, to_square)
+        json_seconds = time.perf_counter() - start
+
+        with GameArchive(binary_path) as archive:
+            numbers = [random.randrange(len(archive)) for _ in range(10000)]
+            start = time.perf_counter()
+            for number in numbers:
+                archive.get_game(number)
+            lookup_seconds = time.perf_counter() - start
+
+        num_moves = sum(len(moves) for moves in games)
+        print(f"{num_games} games, {num_moves} moves")
+        print(f"binary: {os.path.getsize(binary_path):10d} bytes, replay {num_moves / binary_seconds:10.0f} moves/sec")
+        print(f"json:   {os.path.getsize(json_path):10d} bytes, replay {num_moves / json_seconds:10.0f} moves/sec")
+        print(f"random access: {lookup_seconds / len(numbers) * 1e6:.1f} us/game")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack, inspect and benchmark binary Hasami Shogi game archives")
+    commands = parser.add_subparsers(dest='command', required=True)
+    pack = commands.add_parser('pack', help="append the games of a Tournament results file to an archive")
+    pack.add_argument('results')
+    pack.add_argument('archive')
+    show = commands.add_parser('show', help="print game N of an archive")
+    show.add_argument('archive')
+    show.add_argument('number', type=int)
+    commands.add_parser('benchmark', help="compare binary records with JSON move lists")
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        print(f"{pack_results(args.results, args.archive)} games written to {args.archive}")
+    elif args.command == 'show':
+        with GameArchive(args.archive) as game_archive:
+            game_moves, game_result = game_archive.get_game(args.number)
+        print(' '.join(from_square + '-' + to_square for from_square, to_square in game_moves))
+        print(game_result)
+    else:
+        benchmark()
@@ -0,0 +1,274 @@
+# Description: GameServer hosts many concurrent Hasami Shogi (Variant 1) games over TCP or a Unix socket using
+# asyncio. The protocol is line-delimited JSON: every request is one JSON object on one line and gets exactly one
+# JSON response line, echoing the request's "id" if it had one. Requests:
+#     {"op": "create"}                                  -> {"ok": true, "game": 1}
+#     {"op": "move", "game": 1, "from": "i5", "to": "c5"} -> {"ok": true, "made": true, "state": "UNFINISHED", ...}
+#     {"op": "state", "game": 1}                        -> {"ok": true, "board": [...], "active_player": ...}
+#     {"op": "legal_moves", "game": 1}                  -> {"ok": true, "moves": [["i1", "h1"], ...]}
+#     {"op": "subscribe", "game": 1} / {"op": "unsubscribe", "game": 1}
+#     {"op": "close", "game": 1}
+# Subscribers receive {"event": "move", ...} lines whenever a move is made, and {"event": "closed", ...} when the
+# game is closed or evicted; a subscriber that lets more than SUBSCRIBER_BUFFER_LIMIT bytes of events pile up
+# unread is dropped. Each session holds a BitboardGame, which keeps no undo records for the moves it is sent, so it
+# costs a few hundred bytes however long the game runs (python GameServer.py --check-size checks this), and
+# sessions idle for longer than idle_timeout seconds are evicted. A request line longer than the stream limit gets
+# an error response and closes the connection. With move_cache_size (--move-cache), legal_moves answers come from a
+# MoveCache shared by all sessions, so clients asking about the same position again are served from it.
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+
+from BitboardGame import BitboardGame, random_game
+from MoveCache import MoveCache
+
+SUBSCRIBER_BUFFER_LIMIT = 1 << 20     # bytes of unsent events before a subscriber is dropped
+
+
+class Session:
+    """Represents one hosted game, when it was last used and the connections subscribed to it"""
+
+    __slots__ = ('game', 'last_active', 'subscribers')
+
+    def __init__(self, now):
+        """Creates a session with a new game"""
+        self.game = BitboardGame()
+        self.last_active = now
+        self.subscribers = None     # set of stream writers, created on the first subscription
+
+
+def _state(game_id, game):
+    """Returns the public state of a game as a dict"""
+    black_board, red_board = game.get_boards()
+    board = []
+    for row in range(9):
+        cells = ''
+        for index in range(row * 9, row * 9 + 9):
+            cells += 'B' if black_board >> index & 1 else 'R' if red_board >> index & 1 else '.'
+        board.append(cells)
+    return {
+        'game': game_id,
+        'board': board,     # row 'a' first, column 1 first
+        'active_player': game.get_active_player(),
+        'state': game.get_game_state(),
+        'black_captured': game.get_num_captured_pieces('BLACK'),
+        'red_captured': game.get_num_captured_pieces('RED'),
+    }
+
+
+class GameServer:
+    """Represents an asyncio server hosting Hasami Shogi sessions"""
+
+    def __init__(self, idle_timeout=300.0, max_sessions=1000000, move_cache_size=0):
+        """Creates a server that evicts sessions idle for idle_timeout seconds and hosts at most max_sessions,
+        caching the legal moves of up to move_cache_size positions"""
+        self._idle_timeout = idle_timeout
+        self._max_sessions = max_sessions
+        self._move_cache = MoveCache(move_cache_size) if move_cache_size else None
+        self._sessions = {}
+        self._game_ids = itertools.count(1)
+        self._server = None
+        self._eviction_task = None
+        self._moves = 0
+
+    def get_stats(self):
+        """Returns a dict with the number of hosted sessions and moves made, and the move cache counters"""
+        stats = {'sessions': len(self._sessions), 'moves': self._moves}
+        if self._move_cache is not None:
+            stats['move_cache'] = self._move_cache.get_stats()
+        return stats
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        """Starts listening on host:port, or on the Unix socket unix_path if given"""
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._serve_connection, unix_path)
+        else:
+            self._server = await asyncio.start_server(self._serve_connection, host, port)
+        self._eviction_task = asyncio.create_task(self._evict_idle_sessions())
+        return self._server
+
+    async def stop(self):
+        """Stops listening and cancels idle eviction"""
+        if self._eviction_task:
+            self._eviction_task.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _evict_idle_sessions(self):
+        """Periodically removes sessions that have been idle for longer than the idle timeout"""
+        while True:
+            await asyncio.sleep(max(self._idle_timeout / 4, 0.05))
+            cutoff = time.monotonic() - self._idle_timeout
+            idle = [game_id for game_id, session in self._sessions.items() if session.last_active < cutoff]
+            for game_id in idle:
+                self._close_session(game_id, 'idle')
+
+    def _close_session(self, game_id, reason):
+        """Removes a session and tells its subscribers"""
+        session = self._sessions.pop(game_id, None)
+        if session is not None and session.subscribers:
+            self._broadcast(session, {'event': 'closed', 'game': game_id, 'reason': reason})
+
+    def _broadcast(self, session, event):
+        """Writes an event line to every subscriber of a session, dropping closed connections and subscribers that
+        have fallen more than SUBSCRIBER_BUFFER_LIMIT bytes behind"""
+        line = (json.dumps(event) + '\n').encode()
+        for writer in list(session.subscribers):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > SUBSCRIBER_BUFFER_LIMIT:
+                session.subscribers.discard(writer)
+            else:
+                writer.write(line)
+
+    async def _serve_connection(self, reader, writer):
+        """Answers the requests of one connection until it closes"""
+        subscribed = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:      # longer than the stream limit
+                    writer.write((json.dumps({'ok': False, 'error': 'line too long'}) + '\n').encode())
+                    break
+                if not line:
+                    break
+                request = None
+                try:
+                    request = json.loads(line)
+                    response = self.handle_request(request, writer, subscribed)
+                except (ValueError, TypeError, KeyError) as error:
+                    response = {'ok': False, 'error': f"bad request: {error}"}
+                if isinstance(request, dict) and 'id' in request:
+                    response['id'] = request['id']
+                writer.write((json.dumps(response) + '\n').encode())
+                if writer.transport.get_write_buffer_size() > 65536:    # only wait on slow readers
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game_id in subscribed:
+                session = self._sessions.get(game_id)
+                if session is not None and session.subscribers:
+                    session.subscribers.discard(writer)
+            writer.close()
+
+    def handle_request(self, request, writer=None, subscribed=None):
+        """Returns the response dict for one request. writer and subscribed are used by subscriptions."""
+        op = request['op']
+        now = time.monotonic()
+
+        if op == 'create':
+            if len(self._sessions) >= self._max_sessions:
+                return {'ok': False, 'error': 'too many sessions'}
+            game_id = next(self._game_ids)
+            self._sessions[game_id] = Session(now)
+            return {'ok': True, 'game': game_id}
+
+        game_id = request['game']
+        session = self._sessions.get(game_id)
+        if session is None:
+            return {'ok': False, 'error': f"no such game: {game_id}"}
+        session.last_active = now
+        game = session.game
+
+        if op == 'move':
+            from_square, to_square = request['from'], request['to']
+            made = game.make_move(from_square, to_square)
+            if made:
+                self._moves += 1
+                if session.subscribers:
+                    self._broadcast(session, {'event': 'move', 'game': game_id, 'from': from_square,
+                                              'to': to_square, 'state': game.get_game_state()})
+            return {'ok': True, 'made': made, 'state': game.get_game_state(),
+                    'active_player': game.get_active_player()}
+        if op == 'state':
+            response = _state(game_id, game)
+            response['ok'] = True
+            return response
+        if op == 'legal_moves':
+            if self._move_cache is not None:
+                return {'ok': True, 'moves': self._move_cache.legal_moves(game)}
+            return {'ok': True, 'moves': game.legal_moves()}
+        if op == 'subscribe':
+            if writer is None:
+                return {'ok': False, 'error': 'subscriptions need a connection'}
+            if session.subscribers is None:
+                session.subscribers = set()
+            session.subscribers.add(writer)
+            subscribed.add(game_id)
+            return {'ok': True}
+        if op == 'unsubscribe':
+            if session.subscribers:
+                session.subscribers.discard(writer)
+            if subscribed is not None:
+                subscribed.discard(game_id)
+            return {'ok': True}
+        if op == 'close':
+            self._close_session(game_id, 'closed')
+            return {'ok': True}
+        return {'ok': False, 'error': f"unknown op: {op}"}
+
+
+def _session_size(session):
+    """Returns the bytes held by a session and its game, not counting objects shared with other sessions"""
+    game = session.game
+    size = sys.getsizeof(session) + sys.getsizeof(game) + sys.getsizeof(vars(game))
+    for value in vars(game).values():
+        if isinstance(value, int):
+            size += sys.getsizeof(value)
+        elif isinstance(value, list):
+            size += sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+def check_session_size(num_games=20, seed=0):
+    """Plays random games through handle_request and raises AssertionError if a session grows by more than a few
+    bytes between its 10th move and the end of its game"""
+    server = GameServer()
+    largest_growth = 0
+    for number in range(num_games):
+        game_id = server.handle_request({'op': 'create'})['game']
+        session = server._sessions[game_id]
+        early_size = None
+        moves = random_game(seed + number)
+        for count, (from_square, to_square) in enumerate(moves, 1):
+            assert server.handle_request({'op': 'move', 'game': game_id, 'from': from_square, 'to': to_square})['made']
+            if count == 10:
+                early_size = _session_size(session)
+        final_size = _session_size(session)
+        assert final_size <= early_size + 64, (number, len(moves), early_size, final_size)
+        largest_growth = max(largest_growth, final_size - early_size)
+        server.handle_request({'op': 'close', 'game': game_id})
+    print(f"session size check passed: {num_games} games, about {final_size} bytes per session, at most "
+          f"{largest_growth} bytes of growth after the 10th move")
+
+
+async def _run_server(host, port, unix_path, idle_timeout, move_cache_size):
+    """Runs a GameServer until interrupted"""
+    server = GameServer(idle_timeout, move_cache_size=move_cache_size)
+    listener = await server.start(host, port, unix_path)
+    print(f"Serving Hasami Shogi on {unix_path or f'{host}:{port}'}")
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host Hasami Shogi games over line-delimited JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--idle-timeout', type=float, default=300.0, help="seconds before an idle game is evicted")
+    parser.add_argument('--move-cache', type=int, default=0, help="positions whose legal moves are cached (0: none)")
+    parser.add_argument('--check-size', action='store_true', help="check that sessions stay small over long games")
+    args = parser.parse_args()
+
+    if args.check_size:
+        check_session_size()
+        sys.exit()
+    try:
+        asyncio.run(_run_server(args.host, args.port, args.unix, args.idle_timeout, args.move_cache))
+    except KeyboardInterrupt:
+        pass
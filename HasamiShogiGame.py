@@ -4,9 +4,107 @@
 # Enemy pieces are captured by occupying the two cells that surround it. A player wins when they capture all
 # but one (or all) of the opponents pieces.
 
+import random
+import time
+
+_move_profiler = None     # receives per-phase timings from make_move while profiling is enabled
+
+
+def set_move_profiler(profiler):
+    """Sends make_move phase timings of every game to profiler (an object with a record method), or stops if None"""
+    global _move_profiler
+    _move_profiler = profiler
+
+
+_LINE_LENGTH = 9      # line patterns are base-3 numbers: digit 0 empty, 1 BLACK, 2 RED
+_NUM_SQUARES = _LINE_LENGTH * _LINE_LENGTH
+_POWERS_OF_3 = [3 ** position for position in range(_LINE_LENGTH)]
+_DIGITS = {'BLACK': 1, 'RED': 2}
+# square index -> (row, column, digit weight in its row pattern, digit weight in its column pattern)
+_LINE_WEIGHTS = [(row, column, _POWERS_OF_3[column], _POWERS_OF_3[row])
+                 for row in range(_LINE_LENGTH) for column in range(_LINE_LENGTH)]
+
+# square index = row * 9 + column: 'a1' -> 0, 'a9' -> 8, 'i9' -> 80
+SQUARE_NAMES = [letter + str(column) for letter in 'abcdefghi' for column in range(1, 10)]
+SQUARE_INDEX = {square: index for index, square in enumerate(SQUARE_NAMES)}
+
+# 64-bit Zobrist keys, one per square per color plus one for RED to move. BitboardGame draws its 9x9 keys from the
+# same seed in the same order, so both cores give a position the same key.
+ZOBRIST_SEED = 0x4A5B1
+_zobrist_random = random.Random(ZOBRIST_SEED)
+_ZOBRIST_KEYS = {'BLACK': [_zobrist_random.getrandbits(64) for _ in range(_NUM_SQUARES)],
+                 'RED': [_zobrist_random.getrandbits(64) for _ in range(_NUM_SQUARES)]}
+_ZOBRIST_RED_TO_MOVE = _zobrist_random.getrandbits(64)
+del _zobrist_random
+
+
+# captured positions for every (line pattern, mover position); the mover's color is the digit at its position.
+# Entries are computed the first time a pattern is seen.
+_LINE_CAPTURES = [None] * (3 ** _LINE_LENGTH * _LINE_LENGTH)
+
+
+def _compute_line_captures(pattern, moved_position):
+    """Returns the positions captured in a line pattern by the piece that has just moved to moved_position"""
+    cells = [pattern // power % 3 for power in _POWERS_OF_3]
+    own = cells[moved_position]
+    captured = []
+    for step in (-1, 1):
+        run = []
+        position = moved_position + step
+        while 0 <= position < _LINE_LENGTH and cells[position] not in (0, own):
+            run.append(position)
+            position += step
+        if run and 0 <= position < _LINE_LENGTH and cells[position] == own:    # run closed by a friendly piece
+            captured.extend(run)
+    return tuple(captured)
+
+
+def line_captures(pattern, moved_position):
+    """Returns the positions captured in a line pattern by the piece that has just moved to moved_position"""
+    index = pattern * _LINE_LENGTH + moved_position
+    captured = _LINE_CAPTURES[index]
+    if captured is None:
+        captured = _LINE_CAPTURES[index] = _compute_line_captures(pattern, moved_position)
+    return captured
+
+
+def _compute_rays(index):
+    """Returns the squares outward from index towards each edge, nearest first: up, down, left, right"""
+    row, column = divmod(index, _LINE_LENGTH)
+    return (tuple(other * _LINE_LENGTH + column for other in range(row - 1, -1, -1)),
+            tuple(other * _LINE_LENGTH + column for other in range(row + 1, _LINE_LENGTH)),
+            tuple(row * _LINE_LENGTH + other for other in range(column - 1, -1, -1)),
+            tuple(row * _LINE_LENGTH + other for other in range(column + 1, _LINE_LENGTH)))
+
+
+_RAYS = [_compute_rays(index) for index in range(_NUM_SQUARES)]
+
+
+def _compute_paths():
+    """Returns the squares a piece passes over from one square to another, destination included, at
+    [from * 81 + to]; None when the squares do not share a row or column"""
+    paths = [None] * (_NUM_SQUARES * _NUM_SQUARES)
+    for from_index, rays in enumerate(_RAYS):
+        for ray in rays:
+            for length, to_index in enumerate(ray, 1):
+                paths[from_index * _NUM_SQUARES + to_index] = ray[:length]
+    return paths
+
+
+_PATHS = _compute_paths()
+
+# square moved to -> (corner, partner): the opponent piece in the corner is captured if the partner square is held
+_CORNER_CAPTURES = {SQUARE_INDEX[to_square]: (SQUARE_INDEX[corner], SQUARE_INDEX[partner])
+                    for to_square, corner, partner in (('a2', 'a1', 'b1'), ('b1', 'a1', 'a2'), ('a8', 'a9', 'b9'),
+                                                       ('b9', 'a9', 'a8'), ('h1', 'i1', 'i2'), ('i2', 'i1', 'h1'),
+                                                       ('i8', 'i9', 'h9'), ('h9', 'i9', 'i8'))}
+
+
 class GamePiece:
     """Represents a Hasami Shogi game piece"""
 
+    __slots__ = ('_color', '_location')
+
     def __init__(self, color, location):
         """Creates a game piece with color and location"""
         self._color = color
@@ -47,6 +145,9 @@ class HasamiShogiGame:
         self._active_player = 'BLACK'   # player either BLACK or RED. BLACK gets first move
         self._black_captured_pieces = 0
         self._red_captured_pieces = 0
+        self._feature_tracker = None    # EvaluationFeatures.FeatureTracker, created by the first features() call
+        self._move_stack = []   # one (from_idx, to_idx, piece lists, captured counts, state, key) record per push
+        self._index_squares()
 
     def get_game_state(self):
         """Returns the current state of the game"""
@@ -64,6 +165,32 @@ class HasamiShogiGame:
         if color == 'RED':
             return self._red_captured_pieces
 
+    def set_position(self, black_squares, red_squares, active_player, black_captured_pieces, red_captured_pieces,
+                     game_state):
+        """Replaces the pieces, active player, captured counts and state of the game"""
+        self._black_pieces = [GamePiece('BLACK', square) for square in black_squares]
+        self._red_pieces = [GamePiece('RED', square) for square in red_squares]
+        self._active_player = active_player
+        self._black_captured_pieces = black_captured_pieces
+        self._red_captured_pieces = red_captured_pieces
+        self._game_state = game_state
+        self._feature_tracker = None
+        self._move_stack = []
+        self._index_squares()
+
+    def features(self):
+        """Returns {'BLACK': {...}, 'RED': {...}} with the mobility, threatened, edge and corner counts of each color.
+        The first call starts tracking them, after which every move updates them incrementally."""
+        if self._feature_tracker is None:
+            from EvaluationFeatures import FeatureTracker       # imported here as it builds on this module
+            self._feature_tracker = FeatureTracker(self._rows, self._columns)
+        return self._feature_tracker.features()
+
+    def _update_features(self, from_idx, to_idx, captured):
+        """Tells the feature tracker, which reads the row and column patterns, about a move and the square indices
+        it captured"""
+        self._feature_tracker.move(from_idx, to_idx, captured)
+
     def _game_start(self, color):
         """Places game pieces on board in starting position"""
         if color == 'BLACK':
@@ -101,417 +228,85 @@ class HasamiShogiGame:
         elif self._red_captured_pieces == 8 or self._red_captured_pieces == 9:
             self._game_state = 'BLACK_WON'
 
+    def _index_squares(self):
+        """Rebuilds the table of the piece on each square index (None when empty), the base-3 line pattern of
+        each row and column and the Zobrist key from the piece lists and the active player"""
+        self._squares = [None] * _NUM_SQUARES
+        self._rows = [0] * _LINE_LENGTH          # digit per column
+        self._columns = [0] * _LINE_LENGTH       # digit per row
+        key = _ZOBRIST_RED_TO_MOVE if self._active_player == 'RED' else 0
+        for piece in self._black_pieces + self._red_pieces:
+            index = SQUARE_INDEX[piece.get_location()]
+            self._set_square(index, piece)
+            key ^= _ZOBRIST_KEYS[piece.get_color()][index]
+        self._zobrist_key = key
+
+    def _set_square(self, index, piece):
+        """Puts piece (or None) on square index, keeping its row and column line patterns up to date"""
+        old_piece = self._squares[index]
+        change = (0 if piece is None else _DIGITS[piece.get_color()]) \
+            - (0 if old_piece is None else _DIGITS[old_piece.get_color()])
+        self._squares[index] = piece
+        row, column, row_weight, column_weight = _LINE_WEIGHTS[index]
+        self._rows[row] += change * row_weight
+        self._columns[column] += change * column_weight
+
     def get_square_occupant(self, square):
         """Returns color of piece if square is occupied. Otherwise, returns None."""
-        for piece in self._black_pieces:
-            if piece.get_location() == square:
-                return 'BLACK'
-
-        for piece in self._red_pieces:
-            if piece.get_location() == square:
-                return 'RED'
-
-        return 'NONE'
-
-    def _check_boundaries(self, to_square):
-        """Return True if move is within boundaries of game board. Otherwise, return False"""
-        valid_move_check = list(to_square)
-        if valid_move_check[0] in ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i']:
-            if int(valid_move_check[1]) in [1, 2, 3, 4, 5, 6, 7, 8, 9]:
-                return True
-        else:
-            return False
-
-    def _check_occupied(self, to_square):
-        """Return True if space is occupied. Otherwise, return False"""
-        if self.get_square_occupant(to_square) == 'NONE':
-            return False
+        index = SQUARE_INDEX.get(square)
+        piece = None if index is None else self._squares[index]
+        if piece is None:
+            return 'NONE'
+        return piece.get_color()
+
+    def _moving_piece(self, from_idx, to_idx):
+        """Returns the active player's piece on square index from_idx if it can slide to to_idx. Otherwise, returns
+        None."""
+        if not (0 <= from_idx < _NUM_SQUARES and 0 <= to_idx < _NUM_SQUARES):
+            return None
+        squares = self._squares
+        piece = squares[from_idx]
+        if piece is None or piece.get_color() != self._active_player:
+            return None
+        path = _PATHS[from_idx * _NUM_SQUARES + to_idx]
+        if path is None:
+            return None     # pieces only move along their row or column
+        for index in path:
+            if squares[index] is not None:
+                return None
+        return piece
+
+    def _find_captures(self, to_idx, color):
+        """Returns the square indices of the pieces captured by the color piece that has just moved to to_idx,
+        looking its row and column patterns up in the line capture table"""
+        row, column = divmod(to_idx, _LINE_LENGTH)
+        captured = [row * _LINE_LENGTH + position for position in line_captures(self._rows[row], column)]
+        captured.extend(position * _LINE_LENGTH + column for position in line_captures(self._columns[column], row))
+
+        squares = self._squares
+        corner_capture = _CORNER_CAPTURES.get(to_idx)
+        if corner_capture is not None:
+            corner, partner = corner_capture
+            if squares[corner] is not None and squares[corner].get_color() != color \
+                    and squares[partner] is not None and squares[partner].get_color() == color:
+                captured.append(corner)
+        return captured
+
+    def _remove_captured(self, captured, color):
+        """Removes the opponent pieces of color on the captured square indices and increases # captured"""
+        pieces = [self._squares[index] for index in captured]
+        keys = _ZOBRIST_KEYS['RED' if color == 'BLACK' else 'BLACK']
+        key = self._zobrist_key
+        for index in captured:
+            self._set_square(index, None)
+            key ^= keys[index]
+        self._zobrist_key = key
+        if color == 'BLACK':
+            self._red_pieces = [piece for piece in self._red_pieces if piece not in pieces]
+            self._red_captured_pieces += len(pieces)
         else:
-            return True
-
-    def _row_check(self, num_var):
-        """Returns a list of other pieces in same row as moving piece"""
-        pieces_in_row = []
-        for piece in self._black_pieces:
-            if num_var in piece.get_location():
-                pieces_in_row.append(piece)
-
-        for piece in self._red_pieces:
-            if num_var in piece.get_location():
-                pieces_in_row.append(piece)
-
-        return pieces_in_row
-
-    def _column_check(self, letter_var):
-        """Returns a list of other pieces in same column as moving piece"""
-        pieces_in_column = []
-        for piece in self._black_pieces:
-            if letter_var in piece.get_location():
-                pieces_in_column.append(piece)
-
-        for piece in self._red_pieces:
-            if letter_var in piece.get_location():
-                pieces_in_column.append(piece)
-
-        return pieces_in_column
-
-    def _check_movement(self, moving_piece, to_square):
-        """Checks movement range and returns True if move is viable. Otherwise, returns False."""
-        current_location = list(moving_piece.get_location())
-        x_upper = 10                        # movement boundaries
-        x_lower = 0
-        y_upper = '`'
-        y_lower = 'j'
-        pieces_in_same_row = self._row_check(current_location[0])
-        pieces_in_same_column = self._column_check(current_location[1])
-        pieces_in_same_row.remove(moving_piece)         #exclude current piece from lists
-        pieces_in_same_column.remove(moving_piece)
-
-        #set row boundaries
-        for piece in pieces_in_same_row:
-            split_val = list(piece.get_location())
-            if int(split_val[1]) < int(current_location[1]):       # splits row in half at current_location
-                if int(split_val[1]) > x_lower:
-                    x_lower = int(split_val[1])
-            else:
-                if int(split_val[1]) < x_upper:
-                    x_upper = int(split_val[1])
-
-        #set column boundaries
-        for piece in pieces_in_same_column:
-            split_val = list(piece.get_location())
-            if split_val[0] < current_location[0]:     # splits column in half at current_location
-                if split_val[0] > y_upper:
-                    y_upper = split_val[0]
-            else:
-                if split_val[0] < y_lower:
-                    y_lower = split_val[0]
-
-        #check if move (to_square) is within boundaries
-        xy_list = list(to_square)
-        if xy_list[0] < y_lower and xy_list[0] > y_upper:
-            if int(xy_list[1]) < x_upper and int(xy_list[1]) > x_lower:
-                return True
-            else:
-                return False
-        else:
-            return False    # move not viable
-
-    def _capture_y(self, moved_piece):
-        """Captures any pieces that moved piece can legally capture on y axis and increases # captured"""
-        current_location = list(moved_piece.get_location())
-        pieces_in_same_column = self._column_check(current_location[1])
-        pieces_in_same_column.remove(moved_piece)
-        y_up = str(chr(ord(current_location[0]) - 1))       # decrements a letter (ex: b to a)
-        y_down = str(chr(ord(current_location[0]) + 1))     # increments a letter (ex: a to b)
-
-        opponent_color = None
-        if moved_piece.get_color() == 'BLACK':  # set opponent_color
-            opponent_color = 'RED'
-        else:
-            opponent_color = 'BLACK'
-
-        for piece in pieces_in_same_column:                # check column for up and down captures
-            up_space = y_up + current_location[1]
-            down_space = y_down + current_location[1]
-            capture_found = False
-            possible_captures = []
-
-            # check for and execute up captures
-            if piece.get_location() == up_space and piece.get_color() == opponent_color:
-                possible_captures.append(piece)
-                y_up = str(chr(ord(y_up) - 1))
-                up_space = y_up + current_location[1]
-                no_capture_1 = False
-                while y_up != '`' and capture_found is False and no_capture_1 is False:
-                    up_space = y_up + current_location[1]
-                    reset_loop_1 = False
-                    for token in pieces_in_same_column:
-                        if reset_loop_1 == True:            # exits to while loop to allow for multi-captures
-                            no_capture_1 = False
-                        else:
-                            if token.get_location() == up_space and token.get_color() == opponent_color:
-                            # when opponent's token is present, add to possible captures and check next token
-                                possible_captures.append(token)
-                                y_up = str(chr(ord(y_up) - 1))
-                                up_space = y_up + current_location[1]
-                                reset_loop_1 = True
-                                no_capture_1 = False
-                            elif token.get_location() == up_space and token.get_color() == moved_piece.get_color():
-                            # when turn player's token is reached, capture opponents tokens
-                                capture_found = True
-                                for capture in possible_captures:
-                                    if capture in self._red_pieces:
-                                        self._red_pieces.remove(capture)
-                                        self._red_captured_pieces += 1
-                                    if capture in self._black_pieces:
-                                        self._black_pieces.remove(capture)
-                                        self._black_captured_pieces += 1
-                                possible_captures.clear()
-                            else:
-                                no_capture_1 = True
-                else:
-                    possible_captures.clear()
-
-            # check for and execute down captures
-            if piece.get_location() == down_space and piece.get_color() == opponent_color:
-                possible_captures.append(piece)
-                y_down = str(chr(ord(y_down) + 1))
-                down_space = y_down + current_location[1]
-                no_capture_2 = False
-                while y_down != 'j' and capture_found is False and no_capture_2 is False:
-                    down_space = y_down + current_location[1]
-                    reset_loop_2 = False
-                    for token in pieces_in_same_column:
-                        if reset_loop_2 == True:                    # exits to while loop to allow for multi-captures
-                            no_capture_2 = False
-                        else:
-                            if token.get_location() == down_space and token.get_color() == opponent_color:
-                            # when opponent's token is present, add to possible captures and check next token
-                                possible_captures.append(token)
-                                y_down = str(chr(ord(y_down) + 1))
-                                down_space = y_down + current_location[1]
-                                reset_loop_2 = True
-                                no_capture_2 = False
-                            elif token.get_location() == down_space and token.get_color() == moved_piece.get_color():
-                            # when turn player's token is reached, capture opponents tokens
-                                capture_found = True
-                                for capture in possible_captures:
-                                    if capture in self._red_pieces:
-                                        self._red_pieces.remove(capture)
-                                        self._red_captured_pieces += 1
-                                    if capture in self._black_pieces:
-                                        self._black_pieces.remove(capture)
-                                        self._black_captured_pieces += 1
-                                possible_captures.clear()
-                            else:
-                                no_capture_2 = True
-                                #possible_captures.clear()
-                else:
-                    possible_captures.clear()
-
-
-    def _capture_x(self, moved_piece):
-        """Captures any pieces that moved piece can legally capture on x axis and increases # captured"""
-        current_location = list(moved_piece.get_location())
-        pieces_in_same_row = self._row_check(current_location[0])
-        pieces_in_same_row.remove(moved_piece)  # exclude current piece from lists
-        x_right = str(int(current_location[1]) + 1)
-        x_left = str(int(current_location[1]) - 1)
-
-        opponent_color = None
-        if moved_piece.get_color() == 'BLACK':      # set opponent_color
-            opponent_color = 'RED'
-        else:
-            opponent_color = 'BLACK'
-
-        for piece in pieces_in_same_row:                # check row for left and right captures
-            right_space = current_location[0] + x_right
-            left_space = current_location[0] + x_left
-            capture_found = False
-            possible_captures = []
-
-            # check for and execute right captures
-            if piece.get_location() == right_space and piece.get_color() == opponent_color:
-                possible_captures.append(piece)
-                x_right = str(int(x_right) + 1)
-                right_space = current_location[0] + x_right
-                no_capture_1 = False
-                while x_right != '10' and capture_found is False and no_capture_1 is False:
-                    right_space = current_location[0] + x_right
-                    reset_loop_1 = False
-                    for token in pieces_in_same_row:
-                        if reset_loop_1 == True:      # exits to while loop to allow for multi-captures
-                            no_capture_1 = False
-                        else:
-                            if token.get_location() == right_space and token.get_color() == opponent_color:
-                            # when opponent's token is present, add to possible captures and check next token
-                                possible_captures.append(token)
-                                x_right = str(int(x_right) + 1)
-                                right_space = current_location[0] + x_right
-                                reset_loop_1 = True
-                                no_capture_1 = False
-                            elif token.get_location() == right_space and token.get_color() == moved_piece.get_color():
-                            # when turn player's token is reached, capture opponents tokens
-                                capture_found = True
-                                for capture in possible_captures:
-                                    if capture in self._red_pieces:
-                                        self._red_pieces.remove(capture)
-                                        self._red_captured_pieces += 1
-                                    if capture in self._black_pieces:
-                                        self._black_pieces.remove(capture)
-                                        self._black_captured_pieces += 1
-                                possible_captures.clear()
-                            else:
-                                no_capture_1 = True
-                else:
-                    possible_captures.clear()
-
-            # check for and execute left captures
-            if piece.get_location() == left_space and piece.get_color() == opponent_color:
-                possible_captures.append(piece)
-                x_left = str(int(x_left) - 1)
-                left_space = current_location[0] + x_left
-                no_capture_2 = False
-                while x_left != '0' and capture_found is False and no_capture_2 is False:
-                    left_space = current_location[0] + x_left
-                    reset_loop_2 = False
-                    for token in pieces_in_same_row:
-                        if reset_loop_2 == True:            # exits to while loop to allow for multi-captures
-                            no_capture_2 = False
-                        else:
-                            if token.get_location() == left_space and token.get_color() == opponent_color:
-                            # when opponent's token is present, add to possible captures and check next token
-                                possible_captures.append(token)
-                                x_left = str(int(x_left) - 1)
-                                left_space = current_location[0] + x_left
-                                reset_loop_2 = True
-                                no_capture_2 = False
-                            elif token.get_location() == left_space and token.get_color() == moved_piece.get_color():
-                            # when turn player's token is reached, capture opponents tokens
-                                capture_found = True
-                                for capture in possible_captures:
-                                    if capture in self._red_pieces:
-                                        self._red_pieces.remove(capture)
-                                        self._red_captured_pieces += 1
-                                    if capture in self._black_pieces:
-                                        self._black_pieces.remove(capture)
-                                        self._black_captured_pieces += 1
-                                possible_captures.clear()
-                            else:
-                                no_capture_2 = True
-                else:
-                    possible_captures.clear()
-
-    def _corner_capture(self, moved_piece):
-        """Capture piece that is in corner capture position and increase the # of pieces captured"""
-        if moved_piece.get_location() == 'a2':
-            if moved_piece.get_color() == 'BLACK':
-                for piece in self._red_pieces:
-                    if piece.get_location() == 'a1':
-                        for token in self._black_pieces:
-                            if token.get_location() == 'b1':
-                                self._red_pieces.remove(piece)
-                                self._red_captured_pieces += 1
-            else:
-                for piece in self._black_pieces:
-                    if piece.get_location() == 'a1':
-                        for token in self._red_pieces:
-                            if token.get_location() == 'b1':
-                                self._black_pieces.remove(piece)
-                                self._black_captured_pieces += 1
-
-        if moved_piece.get_location() == 'b1':
-            if moved_piece.get_color() == 'BLACK':
-                for piece in self._red_pieces:
-                    if piece.get_location() == 'a1':
-                        for token in self._black_pieces:
-                            if token.get_location() == 'a2':
-                                self._red_pieces.remove(piece)
-                                self._red_captured_pieces += 1
-            else:
-                for piece in self._black_pieces:
-                    if piece.get_location() == 'a1':
-                        for token in self._red_pieces:
-                            if token.get_location() == 'a2':
-                                self._black_pieces.remove(piece)
-                                self._black_captured_pieces += 1
-
-        if moved_piece.get_location() == 'a8':
-            if moved_piece.get_color() == 'BLACK':
-                for piece in self._red_pieces:
-                    if piece.get_location() == 'a9':
-                        for token in self._black_pieces:
-                            if token.get_location() == 'b9':
-                                self._red_pieces.remove(piece)
-                                self._red_captured_pieces += 1
-            else:
-                for piece in self._black_pieces:
-                    if piece.get_location() == 'a9':
-                        for token in self._red_pieces:
-                            if token.get_location() == 'b9':
-                                self._black_pieces.remove(piece)
-                                self._black_captured_pieces += 1
-
-        if moved_piece.get_location() == 'b9':
-            if moved_piece.get_color() == 'BLACK':
-                for piece in self._red_pieces:
-                    if piece.get_location() == 'a9':
-                        for token in self._black_pieces:
-                            if token.get_location() == 'a8':
-                                self._red_pieces.remove(piece)
-                                self._red_captured_pieces += 1
-            else:
-                for piece in self._black_pieces:
-                    if piece.get_location() == 'a9':
-                        for token in self._red_pieces:
-                            if token.get_location() == 'a8':
-                                self._black_pieces.remove(piece)
-                                self._black_captured_pieces += 1
-
-        if moved_piece.get_location() == 'h1':
-            if moved_piece.get_color() == 'BLACK':
-                for piece in self._red_pieces:
-                    if piece.get_location() == 'i1':
-                        for token in self._black_pieces:
-                            if token.get_location() == 'i2':
-                                self._red_pieces.remove(piece)
-                                self._red_captured_pieces += 1
-            else:
-                for piece in self._black_pieces:
-                    if piece.get_location() == 'i1':
-                        for token in self._red_pieces:
-                            if token.get_location() == 'i2':
-                                self._black_pieces.remove(piece)
-                                self._black_captured_pieces += 1
-
-        if moved_piece.get_location() == 'i2':
-            if moved_piece.get_color() == 'BLACK':
-                for piece in self._red_pieces:
-                    if piece.get_location() == 'i1':
-                        for token in self._black_pieces:
-                            if token.get_location() == 'h1':
-                                self._red_pieces.remove(piece)
-                                self._red_captured_pieces += 1
-            else:
-                for piece in self._black_pieces:
-                    if piece.get_location() == 'i1':
-                        for token in self._red_pieces:
-                            if token.get_location() == 'h1':
-                                self._black_pieces.remove(piece)
-                                self._black_captured_pieces += 1
-
-        if moved_piece.get_location() == 'i8':
-            if moved_piece.get_color() == 'BLACK':
-                for piece in self._red_pieces:
-                    if piece.get_location() == 'i9':
-                        for token in self._black_pieces:
-                            if token.get_location() == 'h9':
-                                self._red_pieces.remove(piece)
-                                self._red_captured_pieces += 1
-            else:
-                for piece in self._black_pieces:
-                    if piece.get_location() == 'i9':
-                        for token in self._red_pieces:
-                            if token.get_location() == 'h9':
-                                self._black_pieces.remove(piece)
-                                self._black_captured_pieces += 1
-
-        if moved_piece.get_location() == 'h9':
-            if moved_piece.get_color() == 'BLACK':
-                for piece in self._red_pieces:
-                    if piece.get_location() == 'i9':
-                        for token in self._black_pieces:
-                            if token.get_location() == 'i8':
-                                self._red_pieces.remove(piece)
-                                self._red_captured_pieces += 1
-            else:
-                for piece in self._black_pieces:
-                    if piece.get_location() == 'i9':
-                        for token in self._red_pieces:
-                            if token.get_location() == 'i8':
-                                self._black_pieces.remove(piece)
-                                self._black_captured_pieces += 1
+            self._black_pieces = [piece for piece in self._black_pieces if piece not in pieces]
+            self._black_captured_pieces += len(pieces)
 
     def _check_game_state(self):
         """Allows game to continue so long as no player has won"""
@@ -520,53 +315,241 @@ class HasamiShogiGame:
         else:
             return False
 
-    def _check_turn_player(self, from_square):
-        """"Returns True if turn player is moving the correct piece. Otherwise returns False."""
-        for piece in self._black_pieces:
-            if piece.get_location() == from_square:
-                if piece.get_color() == self._active_player:
-                    return True
-
-        for piece in self._red_pieces:
-            if piece.get_location() == from_square:
-                if piece.get_color() == self._active_player:
-                    return True
-
-        return False
-
     def _switch_players(self):
         """Switch active player"""
         if self._active_player == 'BLACK':
             self._active_player = 'RED'
         else:
             self._active_player = 'BLACK'
+        self._zobrist_key ^= _ZOBRIST_RED_TO_MOVE
+
+    def get_zobrist_key(self):
+        """Returns the 64-bit Zobrist key of the current position and side to move, the same as BitboardGame's"""
+        return self._zobrist_key
+
+    def _move_scanned(self, from_idx, to_idx):
+        """Returns how many squares _moving_piece examines for a move"""
+        if not (0 <= from_idx < _NUM_SQUARES and 0 <= to_idx < _NUM_SQUARES):
+            return 0
+        piece = self._squares[from_idx]
+        scanned = 1
+        if piece is not None and piece.get_color() == self._active_player:
+            for index in _PATHS[from_idx * _NUM_SQUARES + to_idx] or ():
+                scanned += 1
+                if self._squares[index] is not None:
+                    break
+        return scanned
+
+    def _captures_scanned(self, to_idx, color):
+        """Returns how many squares _find_captures examines for the corner capture (rows and columns are looked up
+        as line patterns, not scanned)"""
+        corner_capture = _CORNER_CAPTURES.get(to_idx)
+        if corner_capture is None:
+            return 0
+        corner = self._squares[corner_capture[0]]
+        return 2 if corner is not None and corner.get_color() != color else 1
+
+    def _profiled_make_move(self, from_idx, to_idx):
+        """Runs make_move_idx one phase at a time, recording each phase's nanoseconds and squares scanned"""
+        profiler = _move_profiler
+        clock = time.perf_counter_ns
+        move_start = clock()
+
+        def run_phase(phase, scanned, function, *args):
+            start = clock()
+            result = function(*args)
+            profiler.record(phase, clock() - start, scanned)
+            return result
+
+        made = False
+        if run_phase('check_game_state', 0, self._check_game_state) is True:
+            moving_piece = run_phase('check_move', self._move_scanned(from_idx, to_idx), self._moving_piece,
+                                     from_idx, to_idx)
+            if moving_piece is not None:
+                self._set_square(from_idx, None)
+                self._set_square(to_idx, moving_piece)
+                moving_piece.set_location(SQUARE_NAMES[to_idx])
+                color = moving_piece.get_color()
+                keys = _ZOBRIST_KEYS[color]
+                self._zobrist_key ^= keys[from_idx] ^ keys[to_idx]
+                captured = run_phase('find_captures', self._captures_scanned(to_idx, color), self._find_captures,
+                                     to_idx, color)
+                if captured:
+                    opponents = self._red_pieces if color == 'BLACK' else self._black_pieces
+                    run_phase('remove_captured', len(opponents), self._remove_captured, captured, color)
+                if self._feature_tracker is not None:
+                    run_phase('update_features', 0, self._update_features, from_idx, to_idx, captured)
+                run_phase('check_winner', 0, self._check_winner)
+                self._switch_players()
+                made = True
+        profiler.record('make_move', clock() - move_start, 0)
+        return made
+
+    def make_move_idx(self, from_idx, to_idx):
+        """Moves player piece from square index from_idx to square index to_idx (0 to 80, see SQUARE_INDEX) if
+        valid"""
+        if _move_profiler is not None:
+            return self._profiled_make_move(from_idx, to_idx)
 
-    def _identify_piece(self, current_square):
-        """Finds and returns the piece to be interacted with"""
-        for piece in self._black_pieces:
-            if piece.get_location() == current_square:
-                return piece
-
-        for piece in self._red_pieces:
-            if piece.get_location() == current_square:
-                return piece
+        if self._check_game_state() is True:
+            moving_piece = self._moving_piece(from_idx, to_idx)
+            if moving_piece is not None:
+                self._set_square(from_idx, None)
+                self._set_square(to_idx, moving_piece)
+                moving_piece.set_location(SQUARE_NAMES[to_idx])
+                color = moving_piece.get_color()
+                keys = _ZOBRIST_KEYS[color]
+                self._zobrist_key ^= keys[from_idx] ^ keys[to_idx]
+                captured = self._find_captures(to_idx, color)
+                if captured:
+                    self._remove_captured(captured, color)
+                if self._feature_tracker is not None:
+                    self._update_features(from_idx, to_idx, captured)
+                self._check_winner()
+                self._switch_players()
+                return True
+        return False
 
     def make_move(self, from_square, to_square):
         """Moves player piece from given square to new given square if valid"""
-        if self._check_game_state() is True:
-            if self._check_turn_player(from_square) is True:
-                if self._check_boundaries(to_square) is True:
-                    if self._check_occupied(to_square) is False:
-                        moving_piece = self._identify_piece(from_square)    # piece to be moved
-                        if self._check_movement(moving_piece, to_square) is True:
-                            moving_piece.set_location(to_square)
-                            self._capture_x(moving_piece)
-                            self._capture_y(moving_piece)
-                            self._corner_capture(moving_piece)
-                            self._check_winner()
-                            self._switch_players()
-                            return True
-        return False
+        from_idx = SQUARE_INDEX.get(from_square)     # the only place squares are parsed
+        to_idx = SQUARE_INDEX.get(to_square)
+        if from_idx is None or to_idx is None:
+            return False
+        return self.make_move_idx(from_idx, to_idx)
+
+    def push(self, move):
+        """Makes move, a (from_idx, to_idx) pair of square indices, if valid and records how to undo it. Returns
+        True if made. Raises ValueError if an index is not a square index."""
+        from_idx, to_idx = move
+        if not (0 <= from_idx < _NUM_SQUARES and 0 <= to_idx < _NUM_SQUARES):
+            raise ValueError(f"square index out of range in move {move}")
+        # captures replace the piece lists rather than changing them, so the old lists still hold captured pieces
+        record = (from_idx, to_idx, self._black_pieces, self._red_pieces, self._black_captured_pieces,
+                  self._red_captured_pieces, self._game_state, self._zobrist_key)
+        if not self.make_move_idx(from_idx, to_idx):
+            return False
+        self._move_stack.append(record)
+        return True
+
+    def pop(self):
+        """Undoes the most recent pushed move and restores the previous position"""
+        (from_idx, to_idx, black_pieces, red_pieces, black_captured, red_captured, game_state,
+         zobrist_key) = self._move_stack.pop()
+        piece = self._squares[to_idx]
+        self._set_square(to_idx, None)
+        self._set_square(from_idx, piece)
+        piece.set_location(SQUARE_NAMES[from_idx])
+        restored = []
+        if black_captured != self._black_captured_pieces or red_captured != self._red_captured_pieces:
+            for opponent in (red_pieces if piece.get_color() == 'BLACK' else black_pieces):
+                index = SQUARE_INDEX[opponent.get_location()]      # captured pieces keep their last square
+                if self._squares[index] is None:
+                    self._set_square(index, opponent)
+                    restored.append(index)
+        self._black_pieces = black_pieces
+        self._red_pieces = red_pieces
+        self._black_captured_pieces = black_captured
+        self._red_captured_pieces = red_captured
+        self._game_state = game_state
+        self._switch_players()
+        self._zobrist_key = zobrist_key
+        if self._feature_tracker is not None:
+            self._update_features(to_idx, from_idx, restored)     # the same rows and columns changed back
+
+    def get_move_count(self):
+        """Returns the number of moves that can be undone with pop"""
+        return len(self._move_stack)
+
+    def _moves_from_idx(self, from_idx, moves):
+        """Appends (from_square, to_square) for every square the piece on square index from_idx can slide to"""
+        squares = self._squares
+        from_square = SQUARE_NAMES[from_idx]
+        for ray in _RAYS[from_idx]:
+            for to_idx in ray:
+                if squares[to_idx] is not None:
+                    break
+                moves.append((from_square, SQUARE_NAMES[to_idx]))
+
+    def legal_moves(self, color=None):
+        """Returns every (from_square, to_square) move for the pieces of color (the active player by default)"""
+        if self._game_state != 'UNFINISHED':
+            return []
+        if color is None:
+            color = self._active_player
+        moves = []
+        for from_idx, piece in enumerate(self._squares):
+            if piece is not None and piece.get_color() == color:
+                self._moves_from_idx(from_idx, moves)
+        return moves
+
+    def legal_moves_from(self, square):
+        """Returns every (from_square, to_square) move for the piece on square, or an empty list if there is none"""
+        from_idx = SQUARE_INDEX.get(square)
+        if self._game_state != 'UNFINISHED' or from_idx is None or self._squares[from_idx] is None:
+            return []
+        moves = []
+        self._moves_from_idx(from_idx, moves)
+        return moves
+
+    def _slide_limits(self, from_idx):
+        """Returns (first row, last row, first column, last column) the piece on square index from_idx can reach in
+        its column and row"""
+        squares = self._squares
+        row, column = divmod(from_idx, _LINE_LENGTH)
+        first_row = row
+        while first_row > 0 and squares[(first_row - 1) * _LINE_LENGTH + column] is None:
+            first_row -= 1
+        last_row = row
+        while last_row < _LINE_LENGTH - 1 and squares[(last_row + 1) * _LINE_LENGTH + column] is None:
+            last_row += 1
+        first_column = column
+        while first_column > 0 and squares[row * _LINE_LENGTH + first_column - 1] is None:
+            first_column -= 1
+        last_column = column
+        while last_column < _LINE_LENGTH - 1 and squares[row * _LINE_LENGTH + last_column + 1] is None:
+            last_column += 1
+        return first_row, last_row, first_column, last_column
+
+    def validate_moves(self, moves):
+        """Returns a (valid, reason) pair for every (from_square, to_square) move in moves, without changing the
+        game. reason is 'ok' or the first check make_move would fail: 'game_over', 'not_your_piece', 'off_board',
+        'occupied', 'not_in_line' or 'blocked'."""
+        if self._game_state != 'UNFINISHED':
+            return [(False, 'game_over')] * len(moves)
+
+        squares = self._squares     # occupancy comes from the square table; slide limits are built once per batch
+        limits = {}
+
+        results = []
+        for from_square, to_square in moves:
+            from_idx = SQUARE_INDEX.get(from_square)
+            if from_idx is None or squares[from_idx] is None \
+                    or squares[from_idx].get_color() != self._active_player:
+                results.append((False, 'not_your_piece'))
+                continue
+            to_idx = SQUARE_INDEX.get(to_square)
+            if to_idx is None:
+                results.append((False, 'off_board'))
+                continue
+            if squares[to_idx] is not None:
+                results.append((False, 'occupied'))
+                continue
+
+            if from_idx not in limits:
+                limits[from_idx] = self._slide_limits(from_idx)
+            first_row, last_row, first_column, last_column = limits[from_idx]
+            from_row, from_column = divmod(from_idx, _LINE_LENGTH)
+            to_row, to_column = divmod(to_idx, _LINE_LENGTH)
+            if to_row == from_row:
+                reachable = first_column <= to_column <= last_column
+            elif to_column == from_column:
+                reachable = first_row <= to_row <= last_row
+            else:
+                results.append((False, 'not_in_line'))
+                continue
+            results.append((True, 'ok') if reachable else (False, 'blocked'))
+        return results
 
 if __name__ == "__main__":
     game = HasamiShogiGame()
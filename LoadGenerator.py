@@ -0,0 +1,109 @@
+# Description: LoadGenerator measures GameServer throughput and latency. It opens a number of connections, creates
+# the requested number of games spread across them and then plays rounds in which every game sends one move. Each
+# connection pipelines the moves of all of its games, keeps a BitboardGame mirror of each game to choose legal
+# moves locally, and times every request from send to response. Example, against a server started in-process:
+#     python LoadGenerator.py --games 10000 --connections 100 --rounds 20
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from BitboardGame import BitboardGame
+from GameServer import GameServer
+
+
+async def _request_all(reader, writer, requests, latencies):
+    """Sends requests in one batch and returns their responses, recording each request's latency"""
+    sent_at = []
+    for request in requests:
+        sent_at.append(time.perf_counter())
+        writer.write((json.dumps(request) + '\n').encode())
+    await writer.drain()
+
+    responses = []
+    while len(responses) < len(requests):
+        response = json.loads(await reader.readline())
+        if 'event' in response:
+            continue    # subscription events are not responses
+        latencies.append(time.perf_counter() - sent_at[len(responses)])
+        responses.append(response)
+    return responses
+
+
+async def _run_connection(connect, num_games, num_rounds, seed, latencies):
+    """Creates num_games games on one connection, plays num_rounds moves in each and returns the moves made"""
+    reader, writer = await connect()
+    rng = random.Random(seed)
+    created = await _request_all(reader, writer, [{'op': 'create'} for _ in range(num_games)], [])
+    games = {response['game']: BitboardGame() for response in created}
+
+    moves_made = 0
+    for _ in range(num_rounds):
+        requests = []
+        for game_id, mirror in games.items():
+            legal_moves = mirror.legal_moves()
+            if legal_moves:
+                from_square, to_square = rng.choice(legal_moves)
+                mirror.make_move(from_square, to_square)
+                requests.append({'op': 'move', 'game': game_id, 'from': from_square, 'to': to_square})
+        if not requests:
+            break
+        for response in await _request_all(reader, writer, requests, latencies):
+            moves_made += response.get('made', False)
+
+    writer.close()
+    return moves_made
+
+
+async def run_load(num_games, num_connections, num_rounds, host='127.0.0.1', port=8765, unix_path=None,
+                   in_process=True, seed=0):
+    """Runs the load test and prints moves per second and latency percentiles"""
+    server = None
+    if in_process:
+        server = GameServer()
+        await server.start(host, port, unix_path)
+
+    def connect():
+        if unix_path:
+            return asyncio.open_unix_connection(unix_path, limit=1 << 20)
+        return asyncio.open_connection(host, port, limit=1 << 20)
+
+    latencies = []
+    games_per_connection = [num_games // num_connections + (number < num_games % num_connections)
+                            for number in range(num_connections)]
+    start = time.perf_counter()
+    moves = await asyncio.gather(*(_run_connection(connect, games, num_rounds, seed + number, latencies)
+                                   for number, games in enumerate(games_per_connection)))
+    seconds = time.perf_counter() - start
+
+    if server is not None:
+        await server.stop()
+
+    latencies.sort()
+    total_moves = sum(moves)
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+    print(f"{num_games} games on {num_connections} connections, {num_rounds} rounds")
+    print(f"{total_moves} moves in {seconds:.2f}s: {total_moves / seconds:.0f} moves/sec "
+          f"(includes creating the games)")
+    print(f"latency ms: p50 {percentile(0.50):.1f}  p90 {percentile(0.90):.1f}  p99 {percentile(0.99):.1f}  "
+          f"max {latencies[-1] * 1000:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure GameServer moves per second and latency")
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=20, help="moves sent per game")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="connect to this Unix socket path instead of TCP")
+    parser.add_argument('--external', action='store_true', help="use an already running server")
+    args = parser.parse_args()
+
+    asyncio.run(run_load(args.games, args.connections, args.rounds, args.host, args.port, args.unix,
+                         not args.external))
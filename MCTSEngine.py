@@ -0,0 +1,239 @@
+# Description: class MCTSEngine is a Monte Carlo Tree Search opponent for Hasami Shogi (Variant 1). It grows a
+# search tree with UCT selection and scores new leaves with rollouts played by a configurable rollout policy.
+# Playouts are spread across worker processes with root parallelism: each worker searches its own tree from the
+# same position with its own seed, and the root visit counts are summed to pick the move. With a playout budget
+# (no time limit) the result depends only on the seed, the number of workers and the position.
+# Run this file to measure playouts per second for different numbers of workers.
+
+import argparse
+import math
+import multiprocessing
+import random
+import time
+
+from BitboardGame import BitboardGame, SQUARE_NAMES
+from HasamiShogiGame import HasamiShogiGame
+from Position import Position
+
+
+def random_policy(game, moves, rng):
+    """Returns a uniformly random move"""
+    return moves[rng.randrange(len(moves))]
+
+
+def capture_policy(game, moves, rng, samples=8):
+    """Returns the first capturing move among a few random samples, or a random move if none captures"""
+    for _ in range(samples):
+        move = moves[rng.randrange(len(moves))]
+        if game.get_move_captures(move):
+            return move
+    return moves[rng.randrange(len(moves))]
+
+
+ROLLOUT_POLICIES = {'random': random_policy, 'capture': capture_policy}
+
+
+class _Node:
+    """Represents a search tree node reached by move, holding the visits and wins of the player who made it"""
+
+    __slots__ = ('move', 'parent', 'children', 'untried_moves', 'visits', 'wins', 'mover')
+
+    def __init__(self, move, parent, untried_moves, mover):
+        """Creates an unvisited node for move, made by mover, with the moves still to expand from it"""
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried_moves = untried_moves
+        self.visits = 0
+        self.wins = 0.0
+        self.mover = mover
+
+
+def _black_score(game):
+    """Returns the result of a finished or cut-off rollout for BLACK: 1 win, 0 loss, 0.5 even"""
+    state = game.get_game_state()
+    if state == 'BLACK_WON':
+        return 1.0
+    if state == 'RED_WON':
+        return 0.0
+    material = game.get_num_captured_pieces('RED') - game.get_num_captured_pieces('BLACK')
+    return 1.0 if material > 0 else 0.0 if material < 0 else 0.5
+
+
+def _rollout(game, policy, rng, rollout_limit):
+    """Plays policy moves from the current position and returns BLACK's score, leaving the position unchanged"""
+    plies = 0
+    while plies < rollout_limit and game.get_game_state() == 'UNFINISHED':
+        moves = game.legal_move_indices()
+        if not moves:
+            break
+        game.push(policy(game, moves, rng))
+        plies += 1
+    score = _black_score(game)
+    for _ in range(plies):
+        game.pop()
+    return score
+
+
+def search_tree(packed_position, playouts, seed, policy_name='random', exploration=1.4, rollout_limit=80,
+                deadline=None):
+    """Runs up to playouts iterations of MCTS from a packed Position and returns (root statistics, playouts run).
+    Root statistics map each (from_index, to_index) move to (visits, wins for the side to move)."""
+    rng = random.Random(seed)
+    policy = ROLLOUT_POLICIES[policy_name]
+    game = Position.from_packed(packed_position).to_game(BitboardGame)
+    root = _Node(None, None, game.legal_move_indices(), None)
+
+    completed = 0
+    while completed < playouts:
+        if deadline is not None and time.time() >= deadline:
+            break
+        node = root
+        depth = 0
+
+        # selection: descend through fully expanded nodes by UCT
+        while not node.untried_moves and node.children:
+            log_visits = math.log(node.visits)
+            node = max(node.children, key=lambda child: child.wins / child.visits
+                       + exploration * math.sqrt(log_visits / child.visits))
+            game.push(node.move)
+            depth += 1
+
+        # expansion: add one untried move
+        if node.untried_moves and game.get_game_state() == 'UNFINISHED':
+            move = node.untried_moves.pop(rng.randrange(len(node.untried_moves)))
+            mover = game.get_active_player()
+            game.push(move)
+            depth += 1
+            child = _Node(move, node, game.legal_move_indices(), mover)
+            node.children.append(child)
+            node = child
+
+        # simulation and backpropagation
+        black_score = _rollout(game, policy, rng, rollout_limit)
+        while node is not None:
+            node.visits += 1
+            if node.mover == 'BLACK':
+                node.wins += black_score
+            elif node.mover == 'RED':
+                node.wins += 1.0 - black_score
+            node = node.parent
+        for _ in range(depth):
+            game.pop()
+        completed += 1
+
+    return {child.move: (child.visits, child.wins) for child in root.children}, completed
+
+
+def _search_worker(arguments):
+    """Runs search_tree with a tuple of arguments (for the process pool)"""
+    return search_tree(*arguments)
+
+
+class MCTSEngine:
+    """Represents an MCTS engine that runs root-parallel searches in a pool of worker processes"""
+
+    def __init__(self, playouts=2000, workers=1, seed=0, policy='random', exploration=1.4, rollout_limit=80,
+                 time_limit=None, book=None):
+        """Creates an engine. With time_limit set, each move stops at that many seconds (not reproducible).
+        book is an optional OpeningBook whose move is played without searching while the position is in it."""
+        if policy not in ROLLOUT_POLICIES:
+            raise ValueError(f"unknown rollout policy: {policy}")
+        self._playouts = playouts
+        self._workers = workers
+        self._seed = seed
+        self._policy = policy
+        self._exploration = exploration
+        self._rollout_limit = rollout_limit
+        self._time_limit = time_limit
+        self._book = book
+        self._pool = multiprocessing.Pool(workers) if workers > 1 else None
+        self._searches = 0
+        self._stats = {}
+
+    def close(self):
+        """Shuts down the worker processes"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_stats(self):
+        """Returns a dict describing the last search: playouts, seconds, playouts per second, root visits and
+        whether the move came from the opening book"""
+        return dict(self._stats)
+
+    def best_move(self, game):
+        """Returns the most visited (from_square, to_square) move for the active player, or None"""
+        if self._book is not None:
+            start = time.perf_counter()
+            move = self._book.choose_move(game)
+            if move is not None:
+                self._stats = {'playouts': 0, 'seconds': time.perf_counter() - start, 'playouts_per_second': 0.0,
+                               'workers': self._workers, 'book': True}
+                return move
+        packed = Position.from_game(game).get_packed()
+        deadline = time.time() + self._time_limit if self._time_limit else None
+        # every search of this engine gets fresh, reproducible seeds for each worker, distinct for any number of
+        # workers (as Tournament.game_seed does for games)
+        base_seed = (self._seed * 1000003 + self._searches) * self._workers
+        self._searches += 1
+        tasks = [(packed, self._playouts // self._workers + (number < self._playouts % self._workers),
+                  (base_seed + number) & 0xFFFFFFFF, self._policy, self._exploration, self._rollout_limit, deadline)
+                 for number in range(self._workers)]
+
+        start = time.perf_counter()
+        if self._pool is None:
+            results = [_search_worker(task) for task in tasks]
+        else:
+            results = self._pool.map(_search_worker, tasks)
+        seconds = time.perf_counter() - start
+
+        visits = {}
+        wins = {}
+        for root_stats, _ in results:
+            for move, (move_visits, move_wins) in root_stats.items():
+                visits[move] = visits.get(move, 0) + move_visits
+                wins[move] = wins.get(move, 0.0) + move_wins
+        playouts = sum(completed for _, completed in results)
+        self._stats = {
+            'playouts': playouts,
+            'seconds': seconds,
+            'playouts_per_second': playouts / seconds if seconds > 0 else 0.0,
+            'workers': self._workers,
+            'book': False,
+        }
+        if not visits:
+            return None
+        best = max(sorted(visits), key=lambda move: (visits[move], wins[move]))
+        self._stats['visits'] = visits[best]
+        self._stats['win_rate'] = wins[best] / visits[best]
+        return SQUARE_NAMES[best[0]], SQUARE_NAMES[best[1]]
+
+
+def benchmark(playouts, max_workers, policy):
+    """Prints playouts per second from the starting position for 1, 2, 4, ... up to max_workers workers"""
+    workers = 1
+    while workers <= max_workers:
+        with MCTSEngine(playouts, workers, policy=policy) as engine:
+            move = engine.best_move(HasamiShogiGame())
+            stats = engine.get_stats()
+        print(f"{workers:3d} workers: {stats['playouts']} playouts in {stats['seconds']:.2f}s, "
+              f"{stats['playouts_per_second']:8.0f} playouts/sec, best {move[0]}-{move[1]}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure MCTS playouts per second across worker processes")
+    parser.add_argument('--playouts', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--policy', choices=sorted(ROLLOUT_POLICIES), default='random')
+    args = parser.parse_args()
+
+    benchmark(args.playouts, args.workers, args.policy)
@@ -0,0 +1,227 @@
+# Description: class MoveCache is a thread-safe, size-bounded LRU cache of the legal moves of Hasami Shogi
+# (Variant 1) positions and of the pieces each move would capture. Positions are keyed by Position.get_board_key()
+# (the pieces of both colors and the player to move), so every game that reaches a position shares its entry,
+# whether it is a HasamiShogiGame, a BitboardGame or a Position. One cache can serve all the games and threads of a
+# process; GameServer(move_cache_size=...) uses one for legal_moves requests. MoveCache(symmetric=True) keys
+# positions by Symmetry.canonical_key instead, so the up to four symmetric twins of a position share one entry and
+# moves and captures are mapped to and from the representative on each lookup. Run this file to compare cache hits
+# with generating the moves again.
+
+import argparse
+import collections
+import threading
+import time
+import types
+
+from BitboardGame import BitboardGame, FULL_MASK, NUM_SQUARES, SQUARE_NAMES, random_game
+from Position import Position
+from Symmetry import IDENTITY, SQUARE_PERMUTATIONS, canonical_key
+
+# one shared (from_square, to_square) tuple per move, so cache entries only hold references
+_MOVES = [(SQUARE_NAMES[from_index], SQUARE_NAMES[to_index]) for from_index in range(NUM_SQUARES)
+          for to_index in range(NUM_SQUARES)]
+
+# _SQUARE_IMAGES[symmetry][square] and _MOVE_IMAGES[symmetry][move] are the images of square names and moves
+_SQUARE_IMAGES = tuple({square: SQUARE_NAMES[permutation[index]] for index, square in enumerate(SQUARE_NAMES)}
+                       for permutation in SQUARE_PERMUTATIONS)
+_MOVE_IMAGES = tuple({_MOVES[from_index * NUM_SQUARES + to_index]:
+                      _MOVES[permutation[from_index] * NUM_SQUARES + permutation[to_index]]
+                      for from_index in range(NUM_SQUARES) for to_index in range(NUM_SQUARES)}
+                     for permutation in SQUARE_PERMUTATIONS)
+
+
+def position_key(game):
+    """Returns the cache key of the position of a HasamiShogiGame, BitboardGame or Position"""
+    if isinstance(game, Position):
+        return game.get_board_key()
+    if isinstance(game, BitboardGame):
+        black_board, red_board = game.get_boards()
+        return Position(black_board, red_board, game.get_active_player()).get_board_key()
+    return Position.from_game(game).get_board_key()
+
+
+def _compute_entry(key):
+    """Returns {(from_square, to_square): captured squares} for every legal move of the position with key"""
+    game = BitboardGame.from_boards(key & FULL_MASK, key >> NUM_SQUARES & FULL_MASK,
+                                    'RED' if key >> 2 * NUM_SQUARES & 1 else 'BLACK', 0, 0, 'UNFINISHED')
+    entry = {}
+    for move in game.legal_move_indices():
+        captured = game.get_move_captures(move)
+        squares = ()
+        while captured:
+            low_bit = captured & -captured
+            squares += (SQUARE_NAMES[low_bit.bit_length() - 1],)
+            captured ^= low_bit
+        entry[_MOVES[move[0] * NUM_SQUARES + move[1]]] = squares
+    return entry
+
+
+class MoveCache:
+    """Represents a least-recently-used cache of legal moves and their captures, shared by games and threads"""
+
+    def __init__(self, max_positions=10000, symmetric=False):
+        """Creates an empty cache that holds at most max_positions positions, sharing entries between symmetric
+        positions if symmetric is True"""
+        if max_positions < 1:
+            raise ValueError("max_positions must be at least 1")
+        self._max_positions = max_positions
+        self._symmetric = symmetric
+        self._entries = collections.OrderedDict()      # key -> entry, least recently used first
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _entry(self, game):
+        """Returns (entry, symmetry): the cached {(from_square, to_square): captured squares} of the position the
+        symmetry maps a game's position to, computing it on a miss"""
+        if game.get_game_state() != 'UNFINISHED':
+            return {}, IDENTITY
+        key = position_key(game)
+        symmetry = IDENTITY
+        if self._symmetric:
+            key, symmetry = canonical_key(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry, symmetry
+            self._misses += 1
+
+        entry = _compute_entry(key)     # outside the lock, so other threads are not held up by a miss
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_positions:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return entry, symmetry
+
+    def legal_moves(self, game):
+        """Returns every (from_square, to_square) move of the active player of a game"""
+        entry, symmetry = self._entry(game)
+        if symmetry == IDENTITY:
+            return list(entry)
+        move_images = _MOVE_IMAGES[symmetry]        # every symmetry is its own inverse
+        return [move_images[move] for move in entry]
+
+    def move_captures(self, game, from_square, to_square):
+        """Returns the squares the move would capture (empty if none), or None if the move is not legal"""
+        entry, symmetry = self._entry(game)
+        if symmetry == IDENTITY:
+            return entry.get((from_square, to_square))
+        square_images = _SQUARE_IMAGES[symmetry]
+        captured = entry.get((square_images.get(from_square), square_images.get(to_square)))
+        if captured is None:
+            return None
+        return tuple(square_images[square] for square in captured)
+
+    def move_outcomes(self, game):
+        """Returns a read-only {(from_square, to_square): captured squares} of every legal move of a game, for
+        callers that look at many moves of one position"""
+        entry, symmetry = self._entry(game)
+        if symmetry != IDENTITY:
+            move_images = _MOVE_IMAGES[symmetry]
+            square_images = _SQUARE_IMAGES[symmetry]
+            entry = {move_images[move]: tuple(square_images[square] for square in captured)
+                     for move, captured in entry.items()}
+        return types.MappingProxyType(entry)
+
+    def get_stats(self):
+        """Returns a dict with the hits, misses, evictions, cached positions and capacity"""
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses, 'evictions': self._evictions,
+                    'positions': len(self._entries), 'max_positions': self._max_positions}
+
+    def clear(self):
+        """Discards every entry and resets the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+
+def cross_check(num_games=100, seed=0):
+    """Compares the moves and captures of a plain and a symmetric cache with BitboardGame after every move of random
+    games, through caches small enough to evict. Raises AssertionError on the first difference."""
+    caches = (MoveCache(max_positions=500), MoveCache(max_positions=500, symmetric=True))
+    num_positions = 0
+    for number in range(num_games):
+        game = BitboardGame()
+        for move in random_game(seed + number):
+            expected = sorted(game.legal_moves())
+            for cache in caches:
+                for _ in range(2):      # the second lookup is a hit
+                    assert sorted(cache.legal_moves(game)) == expected, (number, move)
+                outcomes = cache.move_outcomes(game)
+                for from_index, to_index in game.legal_move_indices():
+                    captured = cache.move_captures(game, SQUARE_NAMES[from_index], SQUARE_NAMES[to_index])
+                    assert outcomes[SQUARE_NAMES[from_index], SQUARE_NAMES[to_index]] == captured, (number, move)
+                    assert sum(1 << SQUARE_NAMES.index(square) for square in captured) \
+                        == game.get_move_captures((from_index, to_index)), (number, move)
+                assert cache.move_captures(game, 'a1', 'i9') is None
+            game.make_move(*move)
+            num_positions += 1
+    print(f"cross-check passed on {num_positions} positions")
+    for cache in caches:
+        print(f"  {cache.get_stats()}")
+
+
+def benchmark(num_positions=2000, repeats=5, num_threads=4, seed=0):
+    """Prints the cost of legal_moves and move_captures from a plain and a symmetric cache against generating
+    them, and checks the counters when several threads share one cache"""
+    positions = []
+    number = 0
+    while len(positions) < num_positions:
+        moves = random_game(seed + number)
+        number += 1
+        game = BitboardGame()
+        for from_square, to_square in moves[:len(moves) // 2]:
+            game.make_move(from_square, to_square)
+        if game.get_game_state() == 'UNFINISHED':
+            positions.append(game)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for game in positions:
+            for move in game.legal_move_indices():
+                game.get_move_captures(move)
+    generate_seconds = (time.perf_counter() - start) / (repeats * num_positions)
+    print(f"moves + captures, generated:      {generate_seconds * 1e6:8.1f} us/position")
+
+    for name, cache in (('plain', MoveCache(max_positions=num_positions)),
+                        ('symmetric', MoveCache(max_positions=num_positions, symmetric=True))):
+        for game in positions:
+            cache.legal_moves(game)
+        timings = []
+        for lookup in (lambda game: list(cache.move_outcomes(game).items()), cache.legal_moves,
+                       lambda game: cache.move_captures(game, 'a1', 'a2')):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                for game in positions:
+                    lookup(game)
+            timings.append((time.perf_counter() - start) / (repeats * num_positions) * 1e6)
+        print(f"{name + ' cache:':17s} moves + captures {timings[0]:8.1f} us/position, legal_moves "
+              f"{timings[1]:6.1f} us, one move_captures {timings[2]:6.1f} us")
+
+    shared = MoveCache(max_positions=num_positions // 2)
+    threads = [threading.Thread(target=lambda: [shared.legal_moves(game) for game in positions])
+               for _ in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = shared.get_stats()
+    assert stats['hits'] + stats['misses'] == num_threads * num_positions
+    assert stats['positions'] <= stats['max_positions']
+    print(f"{num_threads} threads sharing a half-size cache: {stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark the legal move cache")
+    parser.add_argument('--positions', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    cross_check()
+    benchmark(args.positions, num_threads=args.threads)
@@ -0,0 +1,93 @@
+# Description: class MoveProfiler is an opt-in instrumentation layer for HasamiShogiGame.make_move. While a
+# profiler is enabled, make_move (and make_move_idx) runs its phases one at a time (_moving_piece, _find_captures,
+# _remove_captured, ...) and reports each phase's duration and the number of squares it scanned. When no profiler
+# is enabled make_move pays for a single global check. Example:
+#     with profile_moves() as profiler:
+#         game.make_move('i5', 'c5')
+#     print(profiler.to_json())
+
+import contextlib
+import json
+
+from HasamiShogiGame import HasamiShogiGame, set_move_profiler
+
+
+class MoveProfiler:
+    """Represents per-phase call counts, cumulative nanoseconds and squares-scanned histograms for make_move"""
+
+    def __init__(self):
+        """Creates an empty profiler"""
+        self._calls = {}
+        self._nanoseconds = {}
+        self._scanned = {}      # phase -> {squares scanned: calls}
+
+    def record(self, phase, nanoseconds, scanned):
+        """Records one call of phase that took nanoseconds and scanned that many squares"""
+        self._calls[phase] = self._calls.get(phase, 0) + 1
+        self._nanoseconds[phase] = self._nanoseconds.get(phase, 0) + nanoseconds
+        histogram = self._scanned.setdefault(phase, {})
+        histogram[scanned] = histogram.get(scanned, 0) + 1
+
+    def reset(self):
+        """Discards everything recorded so far"""
+        self._calls.clear()
+        self._nanoseconds.clear()
+        self._scanned.clear()
+
+    def enable(self):
+        """Starts recording make_move phases of every HasamiShogiGame"""
+        set_move_profiler(self)
+
+    def disable(self):
+        """Stops recording"""
+        set_move_profiler(None)
+
+    def snapshot(self):
+        """Returns a dict of phase -> calls, total and mean nanoseconds and the pieces-scanned histogram"""
+        phases = {}
+        for phase, calls in self._calls.items():
+            phases[phase] = {
+                'calls': calls,
+                'total_ns': self._nanoseconds[phase],
+                'mean_ns': self._nanoseconds[phase] / calls,
+                'pieces_scanned': {str(scanned): count for scanned, count in sorted(self._scanned[phase].items())},
+            }
+        return phases
+
+    def to_json(self):
+        """Returns the snapshot as a JSON string"""
+        return json.dumps(self.snapshot(), indent=2)
+
+    def format_report(self):
+        """Returns a table of the phases, slowest total time first"""
+        lines = [f"{'phase':18s} {'calls':>8s} {'total ms':>10s} {'mean ns':>9s}  share"]
+        total = self._nanoseconds.get('make_move', 0) or 1
+        for phase, stats in sorted(self.snapshot().items(), key=lambda item: -item[1]['total_ns']):
+            lines.append(f"{phase:18s} {stats['calls']:8d} {stats['total_ns'] / 1e6:10.2f} "
+                         f"{stats['mean_ns']:9.0f}  {stats['total_ns'] / total:6.1%}")
+        return '\n'.join(lines)
+
+
+@contextlib.contextmanager
+def profile_moves(profiler=None):
+    """Enables a MoveProfiler (a new one by default) for the duration of a with block and yields it"""
+    if profiler is None:
+        profiler = MoveProfiler()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+
+
+if __name__ == "__main__":
+    from BitboardGame import random_game      # only the demo needs random games
+
+    games = [random_game(seed) for seed in range(50)]
+    with profile_moves() as move_profiler:
+        for moves in games:
+            game = HasamiShogiGame()
+            for from_square, to_square in moves:
+                game.make_move(from_square, to_square)
+    print(move_profiler.format_report())
+    print(move_profiler.to_json())
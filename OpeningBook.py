@@ -0,0 +1,223 @@
+# Description: opening books for Hasami Shogi (Variant 1). A book is built from the opening plies of many games
+# (Tournament results files or GameRecord archives) and stores, for every position reached, the moves played from it
+# and how they scored. Positions are keyed by their 64-bit Zobrist key (BitboardGame.get_zobrist_key), and the file
+# is one sorted array of fixed-size entries, so a lookup is a binary search in a memory-mapped file:
+#     header:  b'HSOB', version (1 byte), 3 reserved bytes, number of entries (4 bytes)
+#     entry:   key (8 bytes), from square (1 byte), to square (1 byte), games, wins, draws (4 bytes each)
+# Wins and draws are counted for the player making the move. Engines given a book play its move instead of
+# searching while the position is in the book. Example, building a book from self-play:
+#     python Tournament.py alphabeta:depth=2 alphabeta:depth=3 --games 2000 --results selfplay.jsonl
+#     python OpeningBook.py build book.hsob --results selfplay.jsonl
+#     python OpeningBook.py benchmark book.hsob
+
+import argparse
+import json
+import mmap
+import random
+import struct
+import time
+
+from BitboardGame import BitboardGame, SQUARE_NAMES, SQUARE_INDEX
+from GameRecord import read_games
+
+MAGIC = b'HSOB'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sB3xI')
+ENTRY = struct.Struct('<QBBIII')
+_KEY = struct.Struct('<Q')     # the key at the start of an entry
+
+
+def _results_games(path):
+    """Yields (moves, result) for every game of a Tournament JSON-lines results file"""
+    with open(path) as results_file:
+        for line in results_file:
+            line = line.strip()
+            if line:
+                result = json.loads(line)
+                yield [(move[:2], move[2:]) for move in result['moves']], result['result']
+
+
+def collect_statistics(games, max_plies=16):
+    """Returns {key: {(from_index, to_index): [games, wins, draws]}} for the first max_plies positions of every
+    (moves, result) game"""
+    statistics = {}
+    for moves, result in games:
+        game = BitboardGame()
+        for from_square, to_square in moves[:max_plies]:
+            move = (SQUARE_INDEX[from_square], SQUARE_INDEX[to_square])
+            mover = game.get_active_player()
+            key = game.get_zobrist_key()
+            if not game.push(move):
+                break
+            record = statistics.setdefault(key, {}).setdefault(move, [0, 0, 0])
+            record[0] += 1
+            if result == 'UNFINISHED':
+                record[2] += 1
+            elif result == mover + '_WON':
+                record[1] += 1
+    return statistics
+
+
+def write_book(path, statistics, min_games=2):
+    """Writes the moves played at least min_games times as a sorted book file and returns the number of entries"""
+    entries = sorted((key, from_index, to_index, games, wins, draws)
+                     for key, moves in statistics.items()
+                     for (from_index, to_index), (games, wins, draws) in moves.items()
+                     if games >= min_games)
+    with open(path, 'wb') as book_file:
+        book_file.write(FILE_HEADER.pack(MAGIC, VERSION, len(entries)))
+        for entry in entries:
+            book_file.write(ENTRY.pack(*entry))
+    return len(entries)
+
+
+def build_book(path, results_paths=(), archive_paths=(), max_plies=16, min_games=2):
+    """Builds a book from Tournament results files and GameRecord archives and returns the number of entries"""
+    statistics = {}
+    sources = [_results_games(results_path) for results_path in results_paths]
+    sources.extend(read_games(archive_path) for archive_path in archive_paths)
+    for source in sources:
+        for key, moves in collect_statistics(source, max_plies).items():
+            merged = statistics.setdefault(key, {})
+            for move, (games, wins, draws) in moves.items():
+                record = merged.setdefault(move, [0, 0, 0])
+                record[0] += games
+                record[1] += wins
+                record[2] += draws
+    return write_book(path, statistics, min_games)
+
+
+class OpeningBook:
+    """Represents a memory-mapped opening book"""
+
+    def __init__(self, path):
+        """Memory-maps the book at path"""
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < FILE_HEADER.size:
+            raise ValueError("not an opening book: file too short")
+        magic, version, self._num_entries = FILE_HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError("not an opening book: bad magic")
+        if version != VERSION:
+            raise ValueError(f"unsupported opening book version {version}")
+        if len(self._map) < FILE_HEADER.size + self._num_entries * ENTRY.size:
+            raise ValueError("opening book is truncated")
+
+    def __len__(self):
+        """Returns the number of (position, move) entries"""
+        return self._num_entries
+
+    def lookup(self, key):
+        """Returns [((from_index, to_index), games, wins, draws)] for every book move of the position with key"""
+        book_map = self._map
+        unpack_key = _KEY.unpack_from
+        low = 0
+        high = self._num_entries
+        while low < high:       # first entry with a key >= key
+            middle = (low + high) // 2
+            if unpack_key(book_map, FILE_HEADER.size + middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        offset = FILE_HEADER.size + low * ENTRY.size
+        while low < self._num_entries:
+            entry_key, from_index, to_index, games, wins, draws = ENTRY.unpack_from(book_map, offset)
+            if entry_key != key:
+                break
+            moves.append(((from_index, to_index), games, wins, draws))
+            low += 1
+            offset += ENTRY.size
+        return moves
+
+    def choose_move(self, game, rng=None):
+        """Returns the book (from_square, to_square) move for the active player of a game, or None if the position
+        is not in the book. Picks the most played move, or a move at random weighted by games if rng is given."""
+        if game.get_game_state() != 'UNFINISHED':
+            return None
+        if not isinstance(game, BitboardGame):
+            game = BitboardGame.from_game(game)
+        candidates = [(games, wins + draws / 2, (SQUARE_NAMES[from_index], SQUARE_NAMES[to_index]))
+                      for (from_index, to_index), games, wins, draws in self.lookup(game.get_zobrist_key())]
+        if not candidates:
+            return None
+        # a key collision could suggest a move that does not exist here, so only legal moves are kept
+        validity = game.validate_moves([move for _, _, move in candidates])
+        candidates = [candidate for candidate, (valid, _) in zip(candidates, validity) if valid]
+        if not candidates:
+            return None
+        if rng is not None:
+            return rng.choices([move for _, _, move in candidates],
+                               weights=[games for games, _, _ in candidates])[0]
+        return max(candidates)[2]
+
+    def close(self):
+        """Unmaps and closes the book"""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def benchmark(path, num_lookups=100000, seed=0):
+    """Prints the time of book lookups for positions in the book and not in it, and of choose_move"""
+    rng = random.Random(seed)
+    with OpeningBook(path) as book:
+        if not len(book):
+            print("empty book")
+            return
+        keys = [ENTRY.unpack_from(book._map, FILE_HEADER.size + rng.randrange(len(book)) * ENTRY.size)[0]
+                for _ in range(1000)]
+        missing = [rng.getrandbits(64) for _ in range(1000)]
+        for name, probe_keys in (('hit', keys), ('miss', missing)):
+            start = time.perf_counter()
+            for number in range(num_lookups):
+                book.lookup(probe_keys[number % len(probe_keys)])
+            seconds = time.perf_counter() - start
+            print(f"lookup ({name}):  {seconds / num_lookups * 1e6:6.2f} us")
+
+        game = BitboardGame()
+        start = time.perf_counter()
+        for _ in range(num_lookups // 10):
+            move = book.choose_move(game)
+        seconds = time.perf_counter() - start
+        print(f"choose_move:    {seconds / (num_lookups // 10) * 1e6:6.2f} us (start position -> {move})")
+        print(f"{len(book)} entries, {FILE_HEADER.size + len(book) * ENTRY.size} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and benchmark Hasami Shogi opening books")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="build a book from results files and game archives")
+    build.add_argument('book')
+    build.add_argument('--results', nargs='*', default=[], help="Tournament JSON-lines results files")
+    build.add_argument('--archives', nargs='*', default=[], help="GameRecord archives")
+    build.add_argument('--plies', type=int, default=16, help="opening plies of each game to record")
+    build.add_argument('--min-games', type=int, default=2, help="drop moves played fewer times than this")
+    show = commands.add_parser('show', help="print the book moves of a position")
+    show.add_argument('book')
+    show.add_argument('moves', nargs='?', default='', help="moves from the start, e.g. 'i5e5 a4d4'")
+    book_benchmark = commands.add_parser('benchmark', help="time lookups")
+    book_benchmark.add_argument('book')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        num_entries = build_book(args.book, args.results, args.archives, args.plies, args.min_games)
+        print(f"{num_entries} entries written to {args.book}")
+    elif args.command == 'show':
+        position = BitboardGame()
+        for text in args.moves.split():
+            position.make_move(text[:2], text[2:])
+        with OpeningBook(args.book) as opening_book:
+            for (book_from, book_to), book_games, book_wins, book_draws in sorted(
+                    opening_book.lookup(position.get_zobrist_key()), key=lambda entry: -entry[1]):
+                print(f"{SQUARE_NAMES[book_from]}-{SQUARE_NAMES[book_to]}  games {book_games:6d}  "
+                      f"score {(book_wins + book_draws / 2) / book_games:.3f}")
+    else:
+        benchmark(args.book)
@@ -0,0 +1,105 @@
+# Description: perft counts the leaf nodes of the move tree to a fixed depth. Because every legal move and every
+# capture changes the count, comparing perft numbers against stored reference counts catches any rules change in
+# a faster move generator or capture routine, and the nodes per second show whether it actually got faster.
+# perft uses BitboardGame; reference_perft walks the same tree with HasamiShogiGame.make_move, so the two can be
+# checked against each other. Run this file to check every fixture against its reference counts.
+
+import argparse
+import copy
+import time
+
+from BitboardGame import BitboardGame, SQUARE_NAMES
+from HasamiShogiGame import HasamiShogiGame
+
+# fixture name -> (moves from the starting position, leaf counts for depth 1, 2, ...)
+FIXTURES = {
+    'start': ('', [63, 3717, 254219, 16599273]),
+    'corner': ('i8d8 a9h9 d8d1', [68, 4052, 287163]),      # RED to move can capture i9 in the corner
+    'midgame': ('i7g7 a8f8 i4h4 a9h9 i5g5 a2h2 i6h6 a3c3 g5g2 c3f3 g7g8 h9h8', [61, 4064, 252304]),
+    'endgame': ('i4f4 a1f1 i9b9 a3f3 i2f2 a8b8 i7b7 a2c2 i8a8 c2c6 i3a3 c6c2', [98, 1846, 183293]),   # RED has 2 left
+}
+
+
+def parse_moves(moves):
+    """Returns the (from_square, to_square) pairs of a space-separated string such as 'i5e5 a4d4'"""
+    return [(move[:2], move[2:]) for move in moves.split()]
+
+
+def perft(game, depth):
+    """Returns the number of leaf nodes depth plies below the position of game (a BitboardGame)"""
+    moves = game.legal_move_indices()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game.push(move)
+        nodes += perft(game, depth - 1)
+        game.pop()
+    return nodes
+
+
+def _reference_moves(game):
+    """Returns every move HasamiShogiGame.make_move accepts, by trying all squares in the piece's row and column"""
+    moves = []
+    for from_square in SQUARE_NAMES:
+        if game.get_square_occupant(from_square) != game.get_active_player():
+            continue
+        for to_square in SQUARE_NAMES:
+            if to_square[0] == from_square[0] or to_square[1] == from_square[1]:
+                candidate = copy.deepcopy(game)
+                if candidate.make_move(from_square, to_square):
+                    moves.append(candidate)
+    return moves
+
+
+def reference_perft(game, depth):
+    """Returns the perft count of a HasamiShogiGame using only its make_move (slow, for checking perft)"""
+    children = _reference_moves(game)
+    if depth == 1:
+        return len(children)
+    return sum(reference_perft(child, depth - 1) for child in children)
+
+
+def fixture_game(name, game_class=BitboardGame):
+    """Returns a game_class instance in the position of a fixture"""
+    game = game_class()
+    for from_square, to_square in parse_moves(FIXTURES[name][0]):
+        if not game.make_move(from_square, to_square):
+            raise ValueError(f"fixture {name}: illegal move {from_square}{to_square}")
+    return game
+
+
+def run_fixtures(max_depth=None, reference_depth=0):
+    """Checks perft against the stored counts of every fixture and prints nodes per second.
+    Also checks reference_perft up to reference_depth. Returns True if everything matched."""
+    all_passed = True
+    for name, (_, counts) in FIXTURES.items():
+        for depth, expected in enumerate(counts, 1):
+            if max_depth is not None and depth > max_depth:
+                break
+            game = fixture_game(name)
+            start = time.perf_counter()
+            nodes = perft(game, depth)
+            seconds = time.perf_counter() - start
+            status = 'ok' if nodes == expected else f'MISMATCH (expected {expected})'
+            all_passed &= nodes == expected
+            print(f"{name:8s} depth {depth}: {nodes:10d} nodes {seconds:8.3f}s "
+                  f"{nodes / seconds if seconds > 0 else 0:12.0f} nodes/sec  {status}")
+
+            if depth <= reference_depth:
+                reference_nodes = reference_perft(fixture_game(name, HasamiShogiGame), depth)
+                all_passed &= reference_nodes == expected
+                print(f"{name:8s} depth {depth}: {reference_nodes:10d} nodes with HasamiShogiGame  "
+                      f"{'ok' if reference_nodes == expected else 'MISMATCH'}")
+    return all_passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check move generation and captures against perft counts")
+    parser.add_argument('--depth', type=int, default=3, help="deepest stored count to check (default 3)")
+    parser.add_argument('--reference-depth', type=int, default=1,
+                        help="also check HasamiShogiGame.make_move up to this depth (slow)")
+    args = parser.parse_args()
+
+    if not run_fixtures(args.depth, args.reference_depth):
+        raise SystemExit(1)
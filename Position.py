@@ -0,0 +1,189 @@
+# Description: class Position is an immutable, hashable snapshot of a Hasami Shogi (Variant 1) position for bulk
+# storage. Everything a game needs to resume is packed into one integer:
+#     bits   0..80   BLACK pieces (bit row * 9 + column, 'a1' = bit 0)
+#     bits  81..161  RED pieces
+#     bit   162      RED to move
+#     bits 163..166  captured BLACK pieces
+#     bits 167..170  captured RED pieces
+#     bits 171..172  game state (0 UNFINISHED, 1 BLACK_WON, 2 RED_WON)
+# A Position object is a few dozen bytes instead of the kilobytes of a HasamiShogiGame. Run this file to compare
+# the memory of one million of each.
+
+import sys
+import tracemalloc
+
+from BitboardGame import BitboardGame, NUM_SQUARES, SQUARE_NAMES, SQUARE_INDEX, FULL_MASK, random_game
+from HasamiShogiGame import HasamiShogiGame
+
+_RED_SHIFT = NUM_SQUARES
+_ACTIVE_SHIFT = 2 * NUM_SQUARES
+_BLACK_CAPTURED_SHIFT = _ACTIVE_SHIFT + 1
+_RED_CAPTURED_SHIFT = _BLACK_CAPTURED_SHIFT + 4
+_STATE_SHIFT = _RED_CAPTURED_SHIFT + 4
+
+_BOARD_KEY_MASK = (1 << _BLACK_CAPTURED_SHIFT) - 1
+
+_STATE_CODES = {'UNFINISHED': 0, 'BLACK_WON': 1, 'RED_WON': 2}
+_STATE_NAMES = ('UNFINISHED', 'BLACK_WON', 'RED_WON')
+
+
+class Position:
+    """Represents an immutable snapshot of a position, side to move, captured counts and game state"""
+
+    __slots__ = ('_packed',)
+
+    def __init__(self, black_board, red_board, active_player='BLACK', black_captured_pieces=0,
+                 red_captured_pieces=0, game_state='UNFINISHED'):
+        """Creates a snapshot from bitboards and game details"""
+        packed = (black_board
+                  | red_board << _RED_SHIFT
+                  | (active_player == 'RED') << _ACTIVE_SHIFT
+                  | black_captured_pieces << _BLACK_CAPTURED_SHIFT
+                  | red_captured_pieces << _RED_CAPTURED_SHIFT
+                  | _STATE_CODES[game_state] << _STATE_SHIFT)
+        object.__setattr__(self, '_packed', packed)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Position is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Position is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self._packed == other._packed
+
+    def __hash__(self):
+        return hash(self._packed)
+
+    def __repr__(self):
+        return f"Position({self.get_black_board():#x}, {self.get_red_board():#x}, {self.get_active_player()!r}, " \
+               f"{self.get_num_captured_pieces('BLACK')}, {self.get_num_captured_pieces('RED')}, " \
+               f"{self.get_game_state()!r})"
+
+    def __reduce__(self):
+        return Position.from_packed, (self._packed,)
+
+    @classmethod
+    def from_packed(cls, packed):
+        """Returns the Position stored as the integer packed (see get_packed)"""
+        position = cls.__new__(cls)
+        object.__setattr__(position, '_packed', packed)
+        return position
+
+    @classmethod
+    def from_game(cls, game):
+        """Returns a snapshot of a HasamiShogiGame, BitboardGame or any game with the same public API"""
+        if isinstance(game, BitboardGame):
+            black_board, red_board = game.get_boards()
+        else:
+            black_board = red_board = 0
+            for index, square in enumerate(SQUARE_NAMES):
+                occupant = game.get_square_occupant(square)
+                if occupant == 'BLACK':
+                    black_board |= 1 << index
+                elif occupant == 'RED':
+                    red_board |= 1 << index
+        return cls(black_board, red_board, game.get_active_player(), game.get_num_captured_pieces('BLACK'),
+                   game.get_num_captured_pieces('RED'), game.get_game_state())
+
+    def to_game(self, game_class=HasamiShogiGame):
+        """Returns a new game of game_class (HasamiShogiGame or BitboardGame) in this position"""
+        if issubclass(game_class, BitboardGame):
+            return game_class.from_boards(self.get_black_board(), self.get_red_board(), self.get_active_player(),
+                                          self.get_num_captured_pieces('BLACK'),
+                                          self.get_num_captured_pieces('RED'), self.get_game_state())
+        game = game_class()
+        black_board = self.get_black_board()
+        red_board = self.get_red_board()
+        game.set_position([SQUARE_NAMES[index] for index in range(NUM_SQUARES) if black_board >> index & 1],
+                          [SQUARE_NAMES[index] for index in range(NUM_SQUARES) if red_board >> index & 1],
+                          self.get_active_player(), self.get_num_captured_pieces('BLACK'),
+                          self.get_num_captured_pieces('RED'), self.get_game_state())
+        return game
+
+    def get_packed(self):
+        """Returns the single integer holding the whole snapshot"""
+        return self._packed
+
+    def get_board_key(self):
+        """Returns the integer holding only the pieces and the player to move, which identifies the position for
+        move generation regardless of captured counts"""
+        return self._packed & _BOARD_KEY_MASK
+
+    def get_black_board(self):
+        """Returns the BLACK bitboard"""
+        return self._packed & FULL_MASK
+
+    def get_red_board(self):
+        """Returns the RED bitboard"""
+        return self._packed >> _RED_SHIFT & FULL_MASK
+
+    def get_active_player(self):
+        """Returns the player to move"""
+        return 'RED' if self._packed >> _ACTIVE_SHIFT & 1 else 'BLACK'
+
+    def get_num_captured_pieces(self, color):
+        """Returns the number of captured pieces of a given color"""
+        if color == 'BLACK':
+            return self._packed >> _BLACK_CAPTURED_SHIFT & 0xF
+
+        if color == 'RED':
+            return self._packed >> _RED_CAPTURED_SHIFT & 0xF
+
+    def get_game_state(self):
+        """Returns the state of the game"""
+        return _STATE_NAMES[self._packed >> _STATE_SHIFT & 0x3]
+
+    def get_square_occupant(self, square):
+        """Returns color of piece if square is occupied. Otherwise, returns 'NONE'."""
+        index = SQUARE_INDEX.get(square)
+        if index is not None:
+            if self._packed >> index & 1:
+                return 'BLACK'
+            if self._packed >> (_RED_SHIFT + index) & 1:
+                return 'RED'
+        return 'NONE'
+
+
+def _measure(create, count):
+    """Returns the bytes per object needed to keep count objects made by create alive (including the list slot)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [create(number) for number in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return used / count
+
+
+def benchmark(count=1000000, game_sample=20000):
+    """Prints the memory of count Position snapshots against count HasamiShogiGame objects.
+    HasamiShogiGame memory is measured on game_sample games and scaled to count."""
+    sources = []
+    for seed in range(100):
+        game = BitboardGame()
+        for from_square, to_square in random_game(seed, 60):
+            game.make_move(from_square, to_square)
+        sources.append(Position.from_game(game))
+
+    def create_position(number):
+        source = sources[number % len(sources)]
+        return Position(source.get_black_board(), source.get_red_board(), source.get_active_player(),
+                        source.get_num_captured_pieces('BLACK'), source.get_num_captured_pieces('RED'),
+                        source.get_game_state())
+
+    def create_game(number):
+        return sources[number % len(sources)].to_game(HasamiShogiGame)
+
+    position_bytes = _measure(create_position, count)
+    game_bytes = _measure(create_game, game_sample)
+    print(f"sys.getsizeof(Position): {sys.getsizeof(sources[0])} bytes + packed int "
+          f"{sys.getsizeof(sources[0].get_packed())} bytes")
+    print(f"Position:        {position_bytes:8.1f} bytes each, {position_bytes * count / 2 ** 20:9.1f} MiB "
+          f"for {count}")
+    print(f"HasamiShogiGame: {game_bytes:8.1f} bytes each, {game_bytes * count / 2 ** 20:9.1f} MiB "
+          f"for {count} (measured on {game_sample})")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,226 @@
+# Description: class PositionBatch holds many Hasami Shogi (Variant 1) positions in one block of
+# multiprocessing.shared_memory, so worker processes can analyse them without pickling game objects. The block is:
+#     header:   number of positions (4 bytes, little endian)
+#     inputs:   24 bytes per position, the Position.get_packed() integer in little endian
+#     results:  8 bytes per position: legal move count (2 bytes), best move from and to square (1 byte each, 255
+#               when there is none), score for the side to move (4 bytes, signed)
+# A worker attaches to the block by name, reads the positions it was given in place and writes its results into the
+# result slots, so only the block name and an index range cross the process boundary. The creating process owns the
+# block and frees it in close(). Before Python 3.13 attaching always registers the block with the attaching
+# process's resource tracker, which may be the creator's (pool workers forked after the tracker started) or its own
+# (anything else), and there is no public way to tell which. So an attaching process unregisters the block again,
+# and the creator registers it once more just before unlinking it, which keeps every tracker's books balanced. Run
+# this file to compare a shared batch with sending pickled HasamiShogiGame objects to a process pool.
+
+import argparse
+import multiprocessing
+import os
+import pickle
+import struct
+import subprocess
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+from AlphaBetaEngine import AlphaBetaEngine
+from BitboardGame import BitboardGame, SQUARE_INDEX, SQUARE_NAMES, random_game
+from HasamiShogiGame import HasamiShogiGame
+from Position import Position
+
+HEADER = struct.Struct('<I')
+POSITION_SIZE = 24      # Position.get_packed() needs 173 bits
+RESULT = struct.Struct('<HBBi')
+NO_SQUARE = 255
+_TRACK_OPTION = sys.version_info >= (3, 13)     # SharedMemory(track=False) attaches without the resource tracker
+
+
+def _tracked_name(name):
+    """Returns the name the resource tracker knows a POSIX shared memory block by"""
+    return name if name.startswith('/') else '/' + name
+
+
+class PositionBatch:
+    """Represents positions and their analysis results in a shared memory block"""
+
+    def __init__(self, num_positions=None, name=None):
+        """Creates a block for num_positions positions, or attaches to the existing block called name"""
+        if name is None:
+            size = HEADER.size + num_positions * (POSITION_SIZE + RESULT.size)
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+            HEADER.pack_into(self._memory.buf, 0, num_positions)
+            self._owner = True
+        else:
+            if _TRACK_OPTION:
+                self._memory = shared_memory.SharedMemory(name=name, track=False)
+            else:
+                self._memory = shared_memory.SharedMemory(name=name)
+                if os.name == 'posix':      # only POSIX shared memory is tracked
+                    resource_tracker.unregister(_tracked_name(name), 'shared_memory')
+            num_positions = HEADER.unpack_from(self._memory.buf)[0]
+            self._owner = False
+        self._num_positions = num_positions
+        self._results_offset = HEADER.size + num_positions * POSITION_SIZE
+
+    @classmethod
+    def from_games(cls, games):
+        """Returns a new batch holding the positions of a list of games (or Position objects)"""
+        batch = cls(len(games))
+        for number, game in enumerate(games):
+            batch.set_position(number, game if isinstance(game, Position) else Position.from_game(game))
+        return batch
+
+    def get_name(self):
+        """Returns the name workers attach to"""
+        return self._memory.name
+
+    def __len__(self):
+        """Returns the number of positions"""
+        return self._num_positions
+
+    def set_position(self, number, position):
+        """Stores a Position in slot number and clears its result"""
+        offset = HEADER.size + number * POSITION_SIZE
+        self._memory.buf[offset:offset + POSITION_SIZE] = position.get_packed().to_bytes(POSITION_SIZE, 'little')
+        self.set_result(number, 0, None, 0)
+
+    def get_position(self, number):
+        """Returns the Position in slot number"""
+        offset = HEADER.size + number * POSITION_SIZE
+        return Position.from_packed(int.from_bytes(self._memory.buf[offset:offset + POSITION_SIZE], 'little'))
+
+    def set_result(self, number, num_moves, best_move, score):
+        """Stores the legal move count, best (from_square, to_square) move or None, and score of slot number"""
+        if best_move is None:
+            from_index = to_index = NO_SQUARE
+        else:
+            from_index, to_index = SQUARE_INDEX[best_move[0]], SQUARE_INDEX[best_move[1]]
+        RESULT.pack_into(self._memory.buf, self._results_offset + number * RESULT.size, num_moves, from_index,
+                         to_index, score)
+
+    def get_result(self, number):
+        """Returns (legal move count, best (from_square, to_square) move or None, score) of slot number"""
+        num_moves, from_index, to_index, score = RESULT.unpack_from(self._memory.buf,
+                                                                    self._results_offset + number * RESULT.size)
+        best_move = None if from_index == NO_SQUARE else (SQUARE_NAMES[from_index], SQUARE_NAMES[to_index])
+        return num_moves, best_move, score
+
+    def close(self):
+        """Detaches from the block, and frees it if this batch created it"""
+        self._memory.close()
+        if self._owner:
+            if not _TRACK_OPTION and os.name == 'posix':
+                # an attached process sharing this tracker may have unregistered the block; unlink unregisters it
+                resource_tracker.register(_tracked_name(self._memory.name), 'shared_memory')
+            self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def analyse_game(game, depth=1):
+    """Returns (legal move count, best move or None, score) of a game, searching depth plies for the best move"""
+    board = game if isinstance(game, BitboardGame) else BitboardGame.from_game(game)
+    num_moves = len(board.legal_move_indices())
+    if not depth or not num_moves:
+        return num_moves, None, 0
+    engine = AlphaBetaEngine(time_limit=float('inf'), max_depth=depth, table_bits=10)
+    best_move = engine.best_move(board)
+    return num_moves, best_move, engine.get_stats()['score']
+
+
+def _analyse_range(task):
+    """Analyses slots [first, last) of a shared batch in place and returns how many were analysed"""
+    name, first, last, depth = task
+    batch = PositionBatch(name=name)
+    try:
+        for number in range(first, last):
+            batch.set_result(number, *analyse_game(batch.get_position(number).to_game(BitboardGame), depth))
+    finally:
+        batch.close()
+    return last - first
+
+
+def analyse_batch(batch, pool=None, depth=1, chunk_size=256):
+    """Analyses every position of a batch, spread over a process pool if given, writing results into the batch"""
+    tasks = [(batch.get_name(), first, min(first + chunk_size, len(batch)), depth)
+             for first in range(0, len(batch), chunk_size)]
+    if pool is None:
+        return sum(map(_analyse_range, tasks))
+    return sum(pool.imap_unordered(_analyse_range, tasks))
+
+
+def _analyse_pickled_game(task):
+    """Analyses one pickled game (the baseline that analyse_batch replaces)"""
+    game, depth = task
+    return analyse_game(game, depth)
+
+
+def check_cleanup():
+    """Runs analyse_batch in a fresh interpreter with a pool started before any shared memory exists, without a
+    pool, and with a pool started afterwards, and raises AssertionError if anything (such as a resource tracker
+    complaint about the shared memory) is written to stderr"""
+    script = ("import multiprocessing\n"
+              "from HasamiShogiGame import HasamiShogiGame\n"
+              "from PositionBatch import PositionBatch, analyse_batch\n"
+              "if __name__ == '__main__':\n"
+              "    games = [HasamiShogiGame() for _ in range(20)]\n"
+              "    with multiprocessing.Pool(2) as pool, PositionBatch.from_games(games) as batch:\n"
+              "        assert analyse_batch(batch, pool, 0, chunk_size=8) == 20\n"
+              "    with PositionBatch.from_games(games) as batch:\n"
+              "        assert analyse_batch(batch, None, 0, chunk_size=8) == 20\n"
+              "        assert batch.get_result(19)[0] == 63\n"
+              "    with multiprocessing.Pool(2) as pool, PositionBatch.from_games(games) as batch:\n"
+              "        assert analyse_batch(batch, pool, 0, chunk_size=8) == 20\n"
+              "        assert batch.get_result(19)[0] == 63\n")
+    result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0 and not result.stderr, result.stderr
+    print("cleanup check passed: analyse_batch with and without pools leaves stderr clean")
+
+
+def benchmark(num_positions=5000, workers=4, depth=1, seed=0):
+    """Compares analysing positions from a shared batch with sending pickled HasamiShogiGame objects to a pool"""
+    games = []
+    number = 0
+    while len(games) < num_positions:
+        moves = random_game(seed + number)
+        number += 1
+        game = HasamiShogiGame()
+        for from_square, to_square in moves[:len(moves) // 2]:
+            game.make_move(from_square, to_square)
+        games.append(game)
+
+    with multiprocessing.Pool(workers) as pool:
+        pool.map(abs, range(workers))       # start the workers before timing
+
+        start = time.perf_counter()
+        pickled_results = pool.map(_analyse_pickled_game, [(game, depth) for game in games], chunksize=256)
+        pickled_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with PositionBatch.from_games(games) as batch:
+            analyse_batch(batch, pool, depth)
+            shared_results = [batch.get_result(number) for number in range(len(batch))]
+        shared_seconds = time.perf_counter() - start
+
+    if [result[0] for result in shared_results] != [result[0] for result in pickled_results]:
+        raise AssertionError("shared batch and pickled games disagree on legal move counts")
+    print(f"{num_positions} positions, {workers} workers, depth {depth}")
+    print(f"pickled games: {len(pickle.dumps(games[0]))} bytes/position, {pickled_seconds:.2f}s, "
+          f"{num_positions / pickled_seconds:8.0f} positions/sec")
+    print(f"shared batch:  {POSITION_SIZE + RESULT.size} bytes/position, {shared_seconds:.2f}s, "
+          f"{num_positions / shared_seconds:8.0f} positions/sec (including packing)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare shared-memory position batches with pickled games")
+    parser.add_argument('--positions', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--depth', type=int, default=1, help="search depth for the best move (0: counts only)")
+    args = parser.parse_args()
+
+    check_cleanup()
+    benchmark(args.positions, args.workers, args.depth)
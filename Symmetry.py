@@ -0,0 +1,196 @@
+# Description: symmetries of Hasami Shogi (Variant 1) positions. The rules and the starting position are unchanged by
+# mirroring the board left to right, and by flipping it top to bottom while swapping the colors and the player to
+# move. Those two and their combination give four symmetries, IDENTITY, MIRROR, COLOR_FLIP and MIRROR_COLOR_FLIP,
+# each of which is its own inverse. canonical_key picks one representative of every class of symmetric positions,
+# so a cache, opening book or tablebase keyed by it stores a class once; transform_move maps a move between a
+# position and its representative in either direction, through precomputed square permutation tables. Boards are
+# transformed whole: the mirror moves each column with one mask and shift, and as a key holds the BLACK board
+# followed by the RED board, reversing the bits of both boards together both rotates them by 180 degrees and swaps
+# the colors, which is MIRROR_COLOR_FLIP. Run this file to measure the entries symmetry saves and the cost of
+# canonicalization.
+
+import itertools
+import time
+
+from BitboardGame import BOARD_SIZE, NUM_SQUARES, SQUARE_NAMES, random_game
+
+IDENTITY = 0
+MIRROR = 1                  # column c -> column 8 - c
+COLOR_FLIP = 2              # row r -> row 8 - r, BLACK <-> RED
+MIRROR_COLOR_FLIP = 3       # both
+SYMMETRIES = (IDENTITY, MIRROR, COLOR_FLIP, MIRROR_COLOR_FLIP)
+SWAPS_COLORS = (False, False, True, True)
+
+_RED_SHIFT = NUM_SQUARES            # board key layout of Position.get_board_key()
+_ACTIVE_SHIFT = 2 * NUM_SQUARES
+_BOARDS_MASK = (1 << _ACTIVE_SHIFT) - 1
+
+# squares of each column on both boards of a key, for _mirror
+_COLUMN_MASKS = tuple(sum(1 << (row * BOARD_SIZE + column) for row in range(2 * BOARD_SIZE))
+                      for column in range(BOARD_SIZE))
+
+
+def _image_square(index, symmetry):
+    """Returns the square index that symmetry moves index to"""
+    row, column = divmod(index, BOARD_SIZE)
+    if symmetry in (MIRROR, MIRROR_COLOR_FLIP):
+        column = BOARD_SIZE - 1 - column
+    if symmetry in (COLOR_FLIP, MIRROR_COLOR_FLIP):
+        row = BOARD_SIZE - 1 - row
+    return row * BOARD_SIZE + column
+
+
+# SQUARE_PERMUTATIONS[symmetry][index] is the image of square index
+SQUARE_PERMUTATIONS = tuple(tuple(_image_square(index, symmetry) for index in range(NUM_SQUARES))
+                            for symmetry in SYMMETRIES)
+
+
+def _mirror(bits):
+    """Returns a board, or both boards of a key, mirrored left to right"""
+    column0, column1, column2, column3, column4, column5, column6, column7, column8 = _COLUMN_MASKS
+    return ((bits & column0) << 8 | (bits & column1) << 6 | (bits & column2) << 4 | (bits & column3) << 2
+            | bits & column4
+            | (bits & column5) >> 2 | (bits & column6) >> 4 | (bits & column7) >> 6 | (bits & column8) >> 8)
+
+
+def _reverse(bits, width):
+    """Returns the bits of an integer smaller than 2 ** width in reverse order, as width-bit numbers"""
+    return int(f'{bits:0{width}b}'[::-1], 2)
+
+
+def transform_board(board, symmetry):
+    """Returns the image of a bitboard under the square permutation of symmetry (colors are not swapped)"""
+    if symmetry == MIRROR:
+        return _mirror(board)
+    if symmetry == COLOR_FLIP:
+        return _mirror(_reverse(board, NUM_SQUARES))
+    if symmetry == MIRROR_COLOR_FLIP:
+        return _reverse(board, NUM_SQUARES)
+    return board
+
+
+def _board_key(black_board, red_board, active_player):
+    """Returns the Position.get_board_key() key of a position"""
+    return black_board | red_board << _RED_SHIFT | (active_player == 'RED') << _ACTIVE_SHIFT
+
+
+def transform_boards(black_board, red_board, active_player, symmetry):
+    """Returns (black_board, red_board, active_player) of the image of a position under symmetry"""
+    black_image = transform_board(black_board, symmetry)
+    red_image = transform_board(red_board, symmetry)
+    if SWAPS_COLORS[symmetry]:
+        return red_image, black_image, 'BLACK' if active_player == 'RED' else 'RED'
+    return black_image, red_image, active_player
+
+
+def canonical_key(key):
+    """Returns (canonical key, symmetry) for a Position.get_board_key() key, where symmetry maps the position to
+    the representative of its class with the smallest key"""
+    boards = key & _BOARDS_MASK
+    red_to_move = key >> _ACTIVE_SHIFT
+    flipped = _reverse(boards, _ACTIVE_SHIFT)     # MIRROR_COLOR_FLIP of both boards at once
+    best_key = key
+    best_symmetry = IDENTITY
+    for symmetry, image in ((MIRROR, _mirror(boards) | red_to_move << _ACTIVE_SHIFT),
+                            (COLOR_FLIP, _mirror(flipped) | (red_to_move ^ 1) << _ACTIVE_SHIFT),
+                            (MIRROR_COLOR_FLIP, flipped | (red_to_move ^ 1) << _ACTIVE_SHIFT)):
+        if image < best_key:
+            best_key = image
+            best_symmetry = symmetry
+    return best_key, best_symmetry
+
+
+def transform_move(move, symmetry):
+    """Returns the image of a (from_index, to_index) move under symmetry. As every symmetry is its own inverse,
+    the same call maps a move of the representative back to the original position."""
+    permutation = SQUARE_PERMUTATIONS[symmetry]
+    return permutation[move[0]], permutation[move[1]]
+
+
+def transform_square_name(square, symmetry):
+    """Returns the image of a square name such as 'a1' under symmetry"""
+    return SQUARE_NAMES[SQUARE_PERMUTATIONS[symmetry][SQUARE_NAMES.index(square)]]
+
+
+def cross_check(num_games=100, seed=0):
+    """Checks on random games that the image of a position under every symmetry has the images of its legal moves
+    and captures and the same canonical key, and that canonical_key's symmetry maps the position to its key.
+    Raises AssertionError on the first difference."""
+    from BitboardGame import BitboardGame
+    num_positions = 0
+    for number in range(num_games):
+        game = BitboardGame()
+        for move in random_game(seed + number):
+            black_board, red_board = game.get_boards()
+            active_player = game.get_active_player()
+            canonical, canonical_symmetry = canonical_key(_board_key(black_board, red_board, active_player))
+            assert _board_key(*transform_boards(black_board, red_board, active_player, canonical_symmetry)) \
+                == canonical, (number, move)
+            expected = {legal_move: game.get_move_captures(legal_move) for legal_move in game.legal_move_indices()}
+            for symmetry in SYMMETRIES:
+                image_boards = transform_boards(black_board, red_board, active_player, symmetry)
+                image = BitboardGame.from_boards(*image_boards, 0, 0, 'UNFINISHED')
+                assert {transform_move(image_move, symmetry): transform_board(image.get_move_captures(image_move),
+                                                                              symmetry)
+                        for image_move in image.legal_move_indices()} == expected, (number, move, symmetry)
+                assert canonical_key(_board_key(*image_boards))[0] == canonical, (number, move, symmetry)
+            game.make_move(*move)
+            num_positions += 1
+    print(f"cross-check passed: moves, captures and canonical keys agree under all symmetries on {num_positions} "
+          f"positions")
+
+
+def _material_keys(num_black, num_red):
+    """Yields the board key of every placement of num_black BLACK and num_red RED pieces, each side to move"""
+    for black_squares in itertools.combinations(range(NUM_SQUARES), num_black):
+        black_board = sum(1 << index for index in black_squares)
+        free_squares = [index for index in range(NUM_SQUARES) if not black_board >> index & 1]
+        for red_squares in itertools.combinations(free_squares, num_red):
+            key = black_board | sum(1 << index for index in red_squares) << _RED_SHIFT
+            yield key
+            yield key | 1 << _ACTIVE_SHIFT
+
+
+def measure(num_games=2000, opening_plies=10, materials=(((1, 1),), ((2, 1), (1, 2))), seed=0):
+    """Prints the entries saved by keying on canonical positions, for endgame tables of each group of materials
+    (every placement, both sides to move) and for the opening positions of random games, and the cost of
+    canonical_key. Adding ((2, 2),) to materials takes a few minutes."""
+    print("endgame tables:")
+    for group in materials:
+        num_positions = 0
+        classes = set()
+        for num_black, num_red in group:
+            for key in _material_keys(num_black, num_red):
+                num_positions += 1
+                classes.add(canonical_key(key)[0])
+        names = ' + '.join(f"{num_black}v{num_red}" for num_black, num_red in group)
+        print(f"  {names:10s} {num_positions:10d} positions -> {len(classes):10d} canonical "
+              f"({num_positions / len(classes):.2f}x)")
+
+    from BitboardGame import BitboardGame
+    positions = set()
+    for number in range(num_games):
+        game = BitboardGame()
+        for move in random_game(seed + number, opening_plies):
+            game.make_move(*move)
+            positions.add(_board_key(*game.get_boards(), game.get_active_player()))
+    classes = {canonical_key(key)[0] for key in positions}
+    print(f"opening positions ({num_games} random games, {opening_plies} plies): {len(positions)} positions -> "
+          f"{len(classes)} canonical ({len(positions) / len(classes):.2f}x)")
+
+    keys = list(positions)
+    start = time.perf_counter()
+    for key in keys:
+        canonical_key(key)
+    seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in keys:
+        transform_move((40, 41), MIRROR_COLOR_FLIP)
+    move_seconds = time.perf_counter() - start
+    print(f"canonical_key:  {seconds / len(keys) * 1e6:6.2f} us")
+    print(f"transform_move: {move_seconds / len(keys) * 1e6:6.2f} us")
+
+
+if __name__ == "__main__":
+    cross_check()
+    measure()
@@ -0,0 +1,433 @@
+# Description: endgame tablebases for Hasami Shogi (Variant 1). A game ends as soon as one side is down to a single
+# piece, so every position with only a few pieces left can be solved exactly. Each material class (number of BLACK
+# and RED pieces on the board) is solved by retrograde analysis and stored in its own file:
+#     header:  b'HSTB', version (1 byte), board size (1 byte), BLACK pieces (1 byte), RED pieces (1 byte)
+#     body:    one byte per position, 0 for a draw, plies to win for the side to move, or 0x80 | plies to lose
+# Positions are numbered by ranking the BLACK and RED squares as combinations (colex order), so the byte of any
+# position is found arithmetically and probes read a single byte of a memory-mapped file. Positions where both
+# colors claim a square are unused slots. A side with no legal moves is scored as a draw, as in AlphaBetaEngine.
+# Run this file to generate tables up to a total number of pieces, or to benchmark probes.
+
+import argparse
+import glob
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import time
+from array import array
+
+from BitboardGame import BitboardGame, BOARD_SIZE, NUM_SQUARES, SLIDES, find_captures
+from Position import Position
+
+MAGIC = b'HSTB'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sBBBB')
+
+DRAW = 0
+LOSS = 0x80             # set on the bytes of lost positions; the low 7 bits hold the distance in plies
+MAX_PLIES = 0x7F
+
+# _BINOMIAL[n][k] is n choose k, for ranking sets of squares
+_BINOMIAL = [[1] + [0] * BOARD_SIZE for _ in range(NUM_SQUARES + 1)]
+for _n in range(1, NUM_SQUARES + 1):
+    for _k in range(1, BOARD_SIZE + 1):
+        _BINOMIAL[_n][_k] = _BINOMIAL[_n - 1][_k - 1] + _BINOMIAL[_n - 1][_k]
+
+# squares next to each square; a move can only capture when it lands next to an opponent piece
+_NEIGHBORS = [sum(ray[0][0] for ray in rays if ray) for rays in SLIDES]
+
+
+def table_name(black_pieces, red_pieces):
+    """Returns the file name of the table for a material class"""
+    return f"{black_pieces}v{red_pieces}.hstb"
+
+
+def rank_board(board):
+    """Returns the colex rank of the set of squares in board among all sets of the same size"""
+    rank = 0
+    count = 1
+    while board:
+        low_bit = board & -board
+        rank += _BINOMIAL[low_bit.bit_length() - 1][count]
+        count += 1
+        board ^= low_bit
+    return rank
+
+
+def decode_value(value):
+    """Returns ('WIN' | 'LOSS' | 'DRAW', plies) for a table byte, from the side to move's point of view"""
+    if value == DRAW:
+        return 'DRAW', 0
+    if value & LOSS:
+        return 'LOSS', value & MAX_PLIES
+    return 'WIN', value
+
+
+class Tablebase:
+    """Represents one memory-mapped material class table"""
+
+    def __init__(self, path):
+        """Memory-maps the table at path"""
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < FILE_HEADER.size:
+            raise ValueError("not a tablebase: file too short")
+        magic, version, board_size, black_pieces, red_pieces = FILE_HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError("not a tablebase: bad magic")
+        if version != VERSION or board_size != BOARD_SIZE:
+            raise ValueError(f"unsupported tablebase version {version} for board size {board_size}")
+        self._black_pieces = black_pieces
+        self._red_pieces = red_pieces
+        self._num_red_sets = _BINOMIAL[NUM_SQUARES][red_pieces]
+        if len(self._map) != FILE_HEADER.size + table_size(black_pieces, red_pieces):
+            raise ValueError("tablebase is truncated")
+
+    def get_material(self):
+        """Returns the (BLACK pieces, RED pieces) of this table"""
+        return self._black_pieces, self._red_pieces
+
+    def __len__(self):
+        """Returns the number of position slots in the table"""
+        return len(self._map) - FILE_HEADER.size
+
+    def get_value(self, black_board, red_board, active_player):
+        """Returns the table byte of a position of this material class"""
+        index = (rank_board(black_board) * self._num_red_sets + rank_board(red_board)) * 2 + (active_player == 'RED')
+        return self._map[FILE_HEADER.size + index]
+
+    def probe_boards(self, black_board, red_board, active_player):
+        """Returns ('WIN' | 'LOSS' | 'DRAW', plies) for the side to move in a position of this material class"""
+        return decode_value(self.get_value(black_board, red_board, active_player))
+
+    def close(self):
+        """Unmaps and closes the table"""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def table_size(black_pieces, red_pieces):
+    """Returns the number of position slots in a material class table"""
+    return _BINOMIAL[NUM_SQUARES][black_pieces] * _BINOMIAL[NUM_SQUARES][red_pieces] * 2
+
+
+class TablebaseSet:
+    """Represents every table in a directory, probed by the material of a game"""
+
+    def __init__(self, directory):
+        """Memory-maps every table file in directory"""
+        self._tables = {}
+        for path in sorted(glob.glob(os.path.join(directory, '*.hstb'))):
+            table = Tablebase(path)
+            self._tables[table.get_material()] = table
+
+    def get_materials(self):
+        """Returns the (BLACK pieces, RED pieces) classes available"""
+        return sorted(self._tables)
+
+    def probe(self, game):
+        """Returns ('WIN' | 'LOSS' | 'DRAW', plies) for the active player of an unfinished HasamiShogiGame or
+        BitboardGame, or None if its material class has no table"""
+        if game.get_game_state() != 'UNFINISHED':
+            return None
+        if isinstance(game, BitboardGame):
+            black_board, red_board = game.get_boards()
+        else:
+            position = Position.from_game(game)
+            black_board, red_board = position.get_black_board(), position.get_red_board()
+        table = self._tables.get((black_board.bit_count(), red_board.bit_count()))
+        if table is None:
+            return None
+        return table.probe_boards(black_board, red_board, game.get_active_player())
+
+    def close(self):
+        """Closes every table"""
+        for table in self._tables.values():
+            table.close()
+        self._tables = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# ---- generation ----
+
+_COMBINATIONS = {}      # number of pieces -> every set of that many squares as a bitboard, in colex order
+_OPEN_TABLES = {}       # path -> Tablebase of a finished smaller class, opened by generation workers
+
+
+def _combinations(pieces):
+    """Returns the list of all bitboards with pieces squares set, where position n holds the set of rank n"""
+    boards = _COMBINATIONS.get(pieces)
+    if boards is None:
+        if pieces == 0:
+            boards = [0]
+        else:
+            smaller = _combinations(pieces - 1)
+            boards = []
+            for top in range(pieces - 1, NUM_SQUARES):
+                top_bit = 1 << top
+                boards.extend(board | top_bit for board in smaller[:_BINOMIAL[top][pieces - 1]])
+        _COMBINATIONS[pieces] = boards
+    return boards
+
+
+def _smaller_value(directory, black_board, red_board, active_player):
+    """Returns the table byte of a position reached by a capture, from the already generated smaller table"""
+    path = os.path.join(directory, table_name(black_board.bit_count(), red_board.bit_count()))
+    table = _OPEN_TABLES.get(path)
+    if table is None:
+        table = _OPEN_TABLES[path] = Tablebase(path)
+    return table.get_value(black_board, red_board, active_player)
+
+
+def _analyse_moves(own_board, opponent_board, color, directory):
+    """Returns (quiet moves, shortest winning capture, longest losing capture, has a drawing capture) for the side
+    to move, looking captures up in the smaller tables. Captures leaving the opponent one piece win in 1 ply."""
+    occupied = own_board | opponent_board
+    opponent_pieces = opponent_board.bit_count()
+    quiet = shortest_win = longest_loss = 0
+    drawn = False
+    board = own_board
+    while board:
+        from_bit = board & -board
+        board ^= from_bit
+        for ray in SLIDES[from_bit.bit_length() - 1]:
+            for bit, to_index in ray:
+                if occupied & bit:
+                    break
+                if _NEIGHBORS[to_index] & opponent_board:
+                    moved_board = own_board ^ from_bit ^ bit
+                    captured = find_captures(to_index, moved_board, opponent_board)
+                    if captured:
+                        if opponent_pieces - captured.bit_count() <= 1:
+                            return quiet, 1, longest_loss, drawn
+                        if color == 'BLACK':
+                            value = _smaller_value(directory, moved_board, opponent_board ^ captured, 'RED')
+                        else:
+                            value = _smaller_value(directory, opponent_board ^ captured, moved_board, 'BLACK')
+                        if value == DRAW:
+                            drawn = True
+                        elif value & LOSS:
+                            plies = (value & MAX_PLIES) + 1
+                            if not shortest_win or plies < shortest_win:
+                                shortest_win = plies
+                        else:
+                            longest_loss = max(longest_loss, value + 1)
+                        continue
+                quiet += 1
+    return quiet, shortest_win, longest_loss, drawn
+
+
+def _initial_values(task):
+    """Scores the captures of every position whose BLACK rank is in [first_rank, last_rank). Returns (first index,
+    values, counters, capture losses, [(index, plies)] of positions already decided)."""
+    black_pieces, red_pieces, directory, first_rank, last_rank = task
+    black_boards = _combinations(black_pieces)
+    red_boards = _combinations(red_pieces)
+    size = (last_rank - first_rank) * len(red_boards) * 2
+    values = bytearray(size)
+    counters = bytearray(size)      # moves inside this class that are not known to lose
+    capture_losses = bytearray(size)
+    decided = []
+    first_index = first_rank * len(red_boards) * 2
+    index = 0
+    for black_board in black_boards[first_rank:last_rank]:
+        for red_board in red_boards:
+            if black_board & red_board:
+                index += 2
+                continue
+            for own_board, opponent_board, color in ((black_board, red_board, 'BLACK'),
+                                                     (red_board, black_board, 'RED')):
+                quiet, shortest_win, longest_loss, drawn = _analyse_moves(own_board, opponent_board, color,
+                                                                          directory)
+                if shortest_win:
+                    # a provisional win: a shorter win through a quiet move may still be found
+                    values[index] = shortest_win
+                    counters[index] = quiet + 1
+                    decided.append((first_index + index, shortest_win))
+                elif quiet or drawn:
+                    counters[index] = quiet + drawn     # a drawing capture means the position is never lost
+                    capture_losses[index] = longest_loss
+                elif longest_loss:
+                    values[index] = LOSS | longest_loss
+                    decided.append((first_index + index, longest_loss))
+                index += 1
+    return first_index, bytes(values), bytes(counters), bytes(capture_losses), decided
+
+
+def _predecessors(task):
+    """Returns, for each position index, an array of the indices of positions in the same class that reach it by a
+    quiet move of the player who is not to move"""
+    black_pieces, red_pieces, indices = task
+    black_boards = _combinations(black_pieces)
+    red_boards = _combinations(red_pieces)
+    num_red_sets = len(red_boards)
+    results = []
+    for index in indices:
+        black_rank, red_rank = divmod(index >> 1, num_red_sets)
+        black_board = black_boards[black_rank]
+        red_board = red_boards[red_rank]
+        occupied = black_board | red_board
+        found = array('I')
+        if index & 1:       # RED to move, so BLACK made the last move
+            mover_board, other_board, other_rank = black_board, red_board, red_rank
+        else:
+            mover_board, other_board, other_rank = red_board, black_board, black_rank
+        board = mover_board
+        while board:
+            to_bit = board & -board
+            board ^= to_bit
+            to_index = to_bit.bit_length() - 1
+            if find_captures(to_index, mover_board, other_board):
+                continue    # arriving here would have captured, changing the material
+            for ray in SLIDES[to_index]:
+                for bit, _ in ray:
+                    if occupied & bit:
+                        break
+                    mover_rank = rank_board(mover_board ^ to_bit ^ bit)
+                    if index & 1:
+                        found.append((mover_rank * num_red_sets + other_rank) * 2)
+                    else:
+                        found.append((other_rank * num_red_sets + mover_rank) * 2 + 1)
+        results.append(found)
+    return results
+
+
+def generate_table(black_pieces, red_pieces, directory, workers=1, verbose=True):
+    """Solves one material class and writes its table to directory. Every class with fewer pieces of either color
+    (and at least two of each) must already be in directory. Returns the path written."""
+    start = time.perf_counter()
+    num_red_sets = _BINOMIAL[NUM_SQUARES][red_pieces]
+    size = table_size(black_pieces, red_pieces)
+    values = bytearray(size)
+    counters = bytearray(size)
+    capture_losses = bytearray(size)
+    buckets = [[] for _ in range(MAX_PLIES + 2)]      # buckets[plies] holds positions decided in that many plies
+
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    mapper = pool.imap_unordered if pool is not None else map
+    try:
+        num_black_sets = _BINOMIAL[NUM_SQUARES][black_pieces]
+        step = max(1, num_black_sets // (workers * 16))
+        tasks = [(black_pieces, red_pieces, directory, first, min(first + step, num_black_sets))
+                 for first in range(0, num_black_sets, step)]
+        for first_index, chunk_values, chunk_counters, chunk_losses, decided in mapper(_initial_values, tasks):
+            end = first_index + len(chunk_values)
+            values[first_index:end] = chunk_values
+            counters[first_index:end] = chunk_counters
+            capture_losses[first_index:end] = chunk_losses
+            for index, plies in decided:
+                buckets[plies].append(index)
+
+        # retrograde: settle positions in order of distance, so the first win found for a position is the shortest
+        # and the last move found to lose decides the length of a loss
+        for plies in range(1, MAX_PLIES + 1):
+            frontier = [index for index in buckets[plies] if values[index] & MAX_PLIES == plies]
+            buckets[plies] = None
+            if not frontier:
+                continue
+            step = max(1, min(4096, len(frontier) // (workers * 4)))
+            tasks = [(black_pieces, red_pieces, frontier[first:first + step])
+                     for first in range(0, len(frontier), step)]
+            next_plies = plies + 1
+            for task, results in zip(tasks, (pool.imap if pool is not None else map)(_predecessors, tasks)):
+                for index, found in zip(task[2], results):
+                    if values[index] & LOSS:
+                        for predecessor in found:
+                            current = values[predecessor]
+                            if not current or (not current & LOSS and current > next_plies):
+                                if next_plies > MAX_PLIES:
+                                    raise ValueError("distance to win does not fit in a table byte")
+                                values[predecessor] = next_plies
+                                buckets[next_plies].append(predecessor)
+                    else:
+                        for predecessor in found:
+                            if not values[predecessor]:
+                                counters[predecessor] -= 1
+                                if not counters[predecessor]:
+                                    loss_plies = max(next_plies, capture_losses[predecessor])
+                                    if loss_plies > MAX_PLIES:
+                                        raise ValueError("distance to win does not fit in a table byte")
+                                    values[predecessor] = LOSS | loss_plies
+                                    buckets[loss_plies].append(predecessor)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    path = os.path.join(directory, table_name(black_pieces, red_pieces))
+    with open(path + '.tmp', 'wb') as table_file:
+        table_file.write(FILE_HEADER.pack(MAGIC, VERSION, BOARD_SIZE, black_pieces, red_pieces))
+        table_file.write(values)
+    os.replace(path + '.tmp', path)
+
+    if verbose:
+        num_positions = sum(1 for black_board in _combinations(black_pieces)
+                            for red_board in _combinations(red_pieces) if not black_board & red_board) * 2
+        num_wins = sum(values.count(plies) for plies in range(1, MAX_PLIES + 1))
+        num_losses = sum(values.count(LOSS | plies) for plies in range(1, MAX_PLIES + 1))
+        longest = max((plies for plies in range(1, MAX_PLIES + 1) if values.count(plies)), default=0)
+        print(f"{black_pieces}v{red_pieces}: {num_positions} positions, {num_wins} won, {num_losses} lost, "
+              f"{num_positions - num_wins - num_losses} drawn, longest win {longest} plies, "
+              f"{time.perf_counter() - start:.1f}s")
+    return path
+
+
+def generate_all(max_pieces, directory, workers=1):
+    """Generates every class with at least two pieces of each color and at most max_pieces in total, smallest
+    first. Tables already in directory are kept, so an interrupted run can be resumed."""
+    os.makedirs(directory, exist_ok=True)
+    for total in range(4, max_pieces + 1):
+        for black_pieces in range(2, total - 1):
+            red_pieces = total - black_pieces
+            if not os.path.exists(os.path.join(directory, table_name(black_pieces, red_pieces))):
+                generate_table(black_pieces, red_pieces, directory, workers)
+
+
+def benchmark(directory, num_probes=100000, seed=0):
+    """Prints the time per probe of every table in directory on random positions of its class"""
+    rng = random.Random(seed)
+    with TablebaseSet(directory) as tables:
+        for black_pieces, red_pieces in tables.get_materials():
+            games = []
+            while len(games) < 1000:
+                squares = rng.sample(range(NUM_SQUARES), black_pieces + red_pieces)
+                black_board = sum(1 << square for square in squares[:black_pieces])
+                red_board = sum(1 << square for square in squares[black_pieces:])
+                game = BitboardGame.from_boards(black_board, red_board, rng.choice(('BLACK', 'RED')))
+                if game.get_game_state() == 'UNFINISHED':
+                    games.append(game)
+            start = time.perf_counter()
+            for number in range(num_probes):
+                tables.probe(games[number % len(games)])
+            seconds = time.perf_counter() - start
+            print(f"{black_pieces}v{red_pieces}: {seconds / num_probes * 1e6:.2f} us/probe")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate and benchmark Hasami Shogi endgame tablebases")
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate = commands.add_parser('generate', help="solve every class up to a total number of pieces")
+    generate.add_argument('directory')
+    generate.add_argument('--max-pieces', type=int, default=4)
+    generate.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    probe_benchmark = commands.add_parser('benchmark', help="time probes of the tables in a directory")
+    probe_benchmark.add_argument('directory')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        generate_all(args.max_pieces, args.directory, args.workers)
+    else:
+        benchmark(args.directory)
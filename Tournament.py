@@ -0,0 +1,225 @@
+# Description: Tournament plays many games between engine variants across a process pool. Every game has
+# deterministic seeds for its random opening and for each of its players, derived from the tournament seed, the game
+# number and the color, so any game can be replayed exactly. Results are streamed back as games finish and appended
+# to a JSON-lines results file, which also lets an interrupted run resume where it stopped: a stored game is only
+# skipped if its players and seed match the game the tournament would play. The report shows win/loss/draw, Elo
+# differences and games per second per worker. Example:
+#     python Tournament.py random alphabeta:depth=2 mcts:playouts=500 --games 200 --workers 4 --results results.jsonl
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from AlphaBetaEngine import AlphaBetaEngine
+from BitboardGame import BitboardGame
+from MCTSEngine import MCTSEngine
+from OpeningBook import OpeningBook
+
+
+class RandomPlayer:
+    """Represents a player that picks uniformly among the legal moves"""
+
+    def __init__(self, seed):
+        """Creates a random player with its own random number generator"""
+        self._rng = random.Random(seed)
+
+    def best_move(self, game):
+        """Returns a random legal (from_square, to_square) move, or None if there is no move"""
+        moves = game.legal_moves()
+        if not moves:
+            return None
+        return self._rng.choice(moves)
+
+
+def make_player(spec, seed, books):
+    """Returns a player for a spec such as 'random', 'alphabeta:depth=3', 'alphabeta:time=0.05' or
+    'mcts:playouts=500,policy=capture'. Engines also take book=PATH to play from an opening book, which is opened
+    once into books, a dict of OpeningBooks by path that the caller closes."""
+    name, _, options = spec.partition(':')
+    settings = dict(option.split('=') for option in options.split(',') if option)
+    book = None
+    if 'book' in settings:
+        book = books.get(settings['book'])
+        if book is None:
+            book = books[settings['book']] = OpeningBook(settings['book'])
+    if name == 'random':
+        return RandomPlayer(seed)
+    if name == 'alphabeta':
+        if 'depth' in settings:     # fixed depth keeps the game reproducible from its seed
+            return AlphaBetaEngine(time_limit=float('inf'), max_depth=int(settings['depth']), book=book)
+        return AlphaBetaEngine(time_limit=float(settings.get('time', 0.05)), book=book)
+    if name == 'mcts':          # one process per game: pool workers cannot start pools of their own
+        return MCTSEngine(int(settings.get('playouts', 500)), seed=seed, policy=settings.get('policy', 'random'),
+                          book=book)
+    raise ValueError(f"unknown player spec: {spec}")
+
+
+SEED_ROLES = {'opening': 0, 'BLACK': 1, 'RED': 2}
+
+
+def game_seed(tournament_seed, game_number, role='opening'):
+    """Returns the deterministic seed of one game of a tournament for its random opening or for the BLACK or RED
+    player. No two (game number, role) pairs of a tournament share a seed."""
+    return ((tournament_seed * 1000003 + game_number) * len(SEED_ROLES) + SEED_ROLES[role]) & 0xFFFFFFFF
+
+
+def play_game(task):
+    """Plays one game described by task and returns its result as a dict. Runs inside a worker process."""
+    start = time.perf_counter()
+    seed = game_seed(task['tournament_seed'], task['game'])
+    rng = random.Random(seed)
+    game = BitboardGame()
+    books = {}
+    players = {}
+    moves = []
+    try:
+        for color in ('BLACK', 'RED'):
+            players[color] = make_player(task[color.lower()], game_seed(task['tournament_seed'], task['game'], color),
+                                         books)
+        while game.get_game_state() == 'UNFINISHED' and len(moves) < task['max_moves']:
+            if len(moves) < task['opening_plies']:     # seeded random opening so games between the same pair differ
+                legal_moves = game.legal_moves()
+                move = rng.choice(legal_moves) if legal_moves else None
+            else:
+                move = players[game.get_active_player()].best_move(game)
+            if move is None:
+                break
+            game.make_move(*move)
+            moves.append(move[0] + move[1])
+    finally:    # players live for one game in a worker, so their pools and book maps go with it
+        for player in players.values():
+            if isinstance(player, MCTSEngine):
+                player.close()
+        for book in books.values():
+            book.close()
+
+    return {
+        'game': task['game'],
+        'seed': seed,
+        'black': task['black'],
+        'red': task['red'],
+        'result': game.get_game_state(),
+        'moves': moves,
+        'seconds': time.perf_counter() - start,
+        'worker': os.getpid(),
+    }
+
+
+def elo_difference(wins, losses, draws):
+    """Returns the Elo difference implied by a score, or +/-inf for a perfect score"""
+    games = wins + losses + draws
+    if games == 0:
+        return 0.0
+    score = (wins + draws / 2) / games
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def load_results(path):
+    """Returns the results already stored in a results file, keyed by game number"""
+    results = {}
+    if path and os.path.exists(path):
+        with open(path) as results_file:
+            for line in results_file:
+                line = line.strip()
+                if line:                    # a run killed mid-write can leave a partial last line
+                    try:
+                        result = json.loads(line)
+                    except ValueError:
+                        continue
+                    results[result['game']] = result
+    return results
+
+
+def run_tournament(players, num_games, workers=None, seed=0, results_path=None, max_moves=300, opening_plies=4):
+    """Plays num_games games between every pair of player specs and returns all results.
+    Games already recorded in results_path are skipped, and new results are appended as they finish."""
+    tasks = []
+    game_number = 0
+    for first in range(len(players)):
+        for second in range(first + 1, len(players)):
+            for number in range(num_games):
+                black, red = (players[first], players[second]) if number % 2 == 0 else (players[second], players[first])
+                tasks.append({'game': game_number, 'tournament_seed': seed, 'black': black, 'red': red,
+                              'max_moves': max_moves, 'opening_plies': opening_plies})
+                game_number += 1
+
+    results = load_results(results_path)
+    stale = [number for number, result in results.items()
+             if number >= len(tasks) or (result.get('black'), result.get('red'), result.get('seed'))
+             != (tasks[number]['black'], tasks[number]['red'], game_seed(seed, number))]
+    for number in stale:    # recorded by a tournament with other players, seed or numbering
+        del results[number]
+    pending = [task for task in tasks if task['game'] not in results]
+    if results or stale:
+        print(f"Resuming: {len(results)} games already played, {len(pending)} to go"
+              + (f" ({len(stale)} stored games did not match this tournament)" if stale else ""))
+
+    results_file = open(results_path, 'a') if results_path else None
+    start = time.perf_counter()
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            for done, result in enumerate(pool.imap_unordered(play_game, pending), 1):
+                results[result['game']] = result
+                if results_file:
+                    results_file.write(json.dumps(result) + '\n')
+                    results_file.flush()
+                elapsed = time.perf_counter() - start
+                print(f"[{done}/{len(pending)}] game {result['game']}: {result['black']} (BLACK) vs "
+                      f"{result['red']} (RED) -> {result['result']} in {len(result['moves'])} moves "
+                      f"({done / elapsed:.1f} games/sec)")
+    finally:
+        if results_file:
+            results_file.close()
+    if pending:
+        elapsed = time.perf_counter() - start
+        print(f"played {len(pending)} games in {elapsed:.1f}s, {len(pending) / elapsed:.2f} games/sec")
+    return [results[task['game']] for task in tasks if task['game'] in results]
+
+
+def print_report(results):
+    """Prints win/loss/draw and Elo difference for every pairing and games per second for every worker"""
+    pairings = {}
+    for result in results:
+        first, second = sorted((result['black'], result['red']))
+        record = pairings.setdefault((first, second), [0, 0, 0])     # first's wins, losses, draws
+        winner = {'BLACK_WON': result['black'], 'RED_WON': result['red']}.get(result['result'])
+        if winner is None:
+            record[2] += 1
+        elif winner == first:
+            record[0] += 1
+        else:
+            record[1] += 1
+
+    for (first, second), (wins, losses, draws) in sorted(pairings.items()):
+        print(f"{first} vs {second}: +{wins} -{losses} ={draws}  "
+              f"Elo {elo_difference(wins, losses, draws):+.0f}")
+
+    workers = {}
+    for result in results:
+        stats = workers.setdefault(result['worker'], [0, 0.0])
+        stats[0] += 1
+        stats[1] += result['seconds']
+    for worker, (games, seconds) in sorted(workers.items()):
+        print(f"worker {worker}: {games} games, {games / seconds:.2f} games/sec")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play a tournament between Hasami Shogi engine variants")
+    parser.add_argument('players', nargs='+', help="player specs, e.g. random alphabeta:depth=2 alphabeta:time=0.05")
+    parser.add_argument('--games', type=int, default=100, help="games per pairing")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--results', help="JSON-lines file that results are appended to and resumed from")
+    parser.add_argument('--max-moves', type=int, default=300, help="moves before a game is scored a draw")
+    args = parser.parse_args()
+
+    all_results = run_tournament(args.players, args.games, args.workers, args.seed, args.results, args.max_moves)
+    print_report(all_results)
@@ -0,0 +1,70 @@
+# Description: class TranspositionTable is a fixed-size hash table of search results keyed by the 64-bit Zobrist
+# key of a position (see BitboardGame.get_zobrist_key). The table never grows: every key maps to one slot, and a
+# replacement policy decides whether a new result may overwrite the one already stored there.
+
+EXACT = 0           # value is the exact score of the position
+LOWER_BOUND = 1     # search failed high, real score is at least value
+UPPER_BOUND = 2     # search failed low, real score is at most value
+
+
+class TranspositionTable:
+    """Represents a bounded transposition table with a depth-preferred, age-aware replacement policy"""
+
+    def __init__(self, size_bits=20):
+        """Creates a table with 2 ** size_bits slots"""
+        self._mask = (1 << size_bits) - 1
+        self._slots = [None] * (1 << size_bits)   # each slot holds (key, depth, generation, value, flag, best_move)
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._replacements = 0
+
+    def get_size(self):
+        """Returns the number of slots in the table"""
+        return len(self._slots)
+
+    def new_search(self):
+        """Marks the start of a new search so entries from older searches are replaced first"""
+        self._generation += 1
+
+    def clear(self):
+        """Empties every slot"""
+        self._slots = [None] * len(self._slots)
+
+    def probe(self, key):
+        """Returns (depth, value, flag, best_move) stored for key, or None if the key is not in the table"""
+        entry = self._slots[key & self._mask]
+        if entry is not None and entry[0] == key:
+            self._hits += 1
+            return entry[1], entry[3], entry[4], entry[5]
+        self._misses += 1
+        return None
+
+    def store(self, key, depth, value, flag, best_move=None):
+        """Stores a search result for key unless the slot holds a deeper result from the current search"""
+        index = key & self._mask
+        entry = self._slots[index]
+        if entry is not None:
+            if entry[0] == key:
+                if depth < entry[1] and entry[2] == self._generation:
+                    return      # keep the deeper result for this position
+                if best_move is None:
+                    best_move = entry[5]    # keep the known best move when storing a bound without one
+            elif depth < entry[1] and entry[2] == self._generation:
+                return          # keep the deeper result for another position
+            else:
+                self._replacements += 1
+        self._slots[index] = (key, depth, self._generation, value, flag, best_move)
+        self._stores += 1
+
+    def get_stats(self):
+        """Returns a dict of hit, miss, store and replacement counts and the fraction of slots in use"""
+        used = len(self._slots) - self._slots.count(None)
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'stores': self._stores,
+            'replacements': self._replacements,
+            'fill': used / len(self._slots),
+        }